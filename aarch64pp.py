@@ -31,6 +31,10 @@
 # $8 = {f = 1.13841227e-21, u = 481036337, s = 481036337}
 
 import gdb
+from os.path import abspath, dirname, join
+gdb.execute(f'source {join(dirname(abspath(__file__)), "regpath.py")}')
+
+import regsnap
 
 GREEN = "\x1b[38;5;47m"
 BLUE = "\x1b[38;5;14m"
@@ -500,7 +504,7 @@ regWinCmd = RegWinCmd()
 
 def RegWinFactory(tui):
     win = RegWindow(tui)
-    gdb.events.before_prompt.connect(win.create_reg)
+    regsnap.snapshot.subscribe(win.create_reg)
     regWinCmd.set_win(win)
     return win
 
@@ -513,23 +517,34 @@ class RegWindow(object):
         self.tui = tui
         tui.title = "Registers"
         self.reglist = RegWindow.reglist_save
-        self.prev = {}
+        self.prev = {}       # name -> raw bytes last shown
+        self.cells = {}      # name -> (raw, hex, text, columns)
         self.hex = False
         self.start = 0
         self.list = []
+        self.generation = None
+        self.width = None
+        regsnap.snapshot.track(self.reglist)
 
     def set_list(self, list):
+        regsnap.snapshot.untrack(self.reglist)
         self.reglist = list
+        regsnap.snapshot.track(self.reglist)
+        self.generation = None
 
     def add_list(self, list):
         self.reglist.extend(list)
+        regsnap.snapshot.track(list)
+        self.generation = None
 
     def set_hex(self, hex):
         self.hex = hex
+        self.generation = None
 
     def close(self):
         RegWindow.reglist_save = self.reglist
-        gdb.events.before_prompt.disconnect(self.create_reg)
+        regsnap.snapshot.unsubscribe(self.create_reg)
+        regsnap.snapshot.untrack(self.reglist)
 
     def render(self):
         if not self.tui.is_valid():
@@ -541,13 +556,20 @@ class RegWindow(object):
             self.tui.write(l)
 
     def create_reg(self):
-        self.list = []
-
         if not self.tui.is_valid():
+            self.list = []
             return
-        
+
+        if self.generation == regsnap.snapshot.generation and self.width == self.tui.width:
+            self.render()
+            return
+
+        self.list = []
+        self.generation = regsnap.snapshot.generation
+        self.width = self.tui.width
+
         try:
-            frame = gdb.selected_frame()
+            regsnap.snapshot.selected_frame()
         except gdb.error:
             self.start = 0
             self.title = "No Frame"
@@ -559,79 +581,24 @@ class RegWindow(object):
         line = ""
 
         for name in self.reglist:
-            reg = frame.read_register(name)
-            hint = BLUE if name in self.prev and self.prev[name] != reg else WHITE
-
-            self.prev[name] = reg
-
-            if self.hex:
-                if reg.type.name == "long":
-                    hexstr = reg.format_string(format="x")
-                    line += f'{GREEN}{name:<5}{hint}{hexstr:<18} {reg.format_string():<24}{RESET}'
-                elif name == "pc" or name == "sp":
-                    line += f'{GREEN}{name:<5}{hint}{reg.format_string():<43}{RESET}'
-                elif name == "cpsr":
-                    hexstr = reg.format_string(format="x")
-                    flags, cond = decode_cpsr(reg, False)
-                    line += f'{GREEN}{name:<5}{hint}{hexstr:<18} {flags:<24}{RESET}'
-                elif name == "fpcr":
-                    hexstr = reg.format_string(format="x")
-                    st = decode_fpcr(reg)
-                    line += f'{GREEN}{name:<5}{hint}{hexstr:<18} {st:<24}{RESET}'
-                elif name == "fpsr":
-                    hexstr = reg.format_string(format="x")
-                    st = decode_fpsr(reg)
-                    line += f'{GREEN}{name:<5}{hint}{hexstr:<18} {st:<24}{RESET}'
-                elif reg.type.name == "__gdb_builtin_type_vnq":
-                    st = reg["u"].format_string(format="z")
-                    line += f'{GREEN}{name:<5}{hint}{st:<43}{RESET}'
-                elif reg.type.name == "__gdb_builtin_type_vnb":
-                    st = reg["u"].format_string(format="x")
-                    line += f'{GREEN}{name:<5}{hint}{st:<18} {reg["s"].format_string():<24}{RESET}'
-                elif reg.type.name == "aarch64v":
-                    st = reg["q"]["u"][0].format_string(format="z")
-                    line += f'{GREEN}{name:<5}{hint}{st:<34}{RESET}         '
-                else: # s & d
-                    st = reg["u"].format_string(format="x")
-                    f = reg["f"].format_string()
-                    line += f'{GREEN}{name:<5}{hint}{st:<18} {f:<24}{RESET}'
-                width = width - 48
-                if width < 48:
-                    line += NL
-                    self.list.append(line)
-                    line = ""
-                    width = self.tui.width
-            else:
-                if reg.type.name == "long" or name == "pc" or name == "sp":
-                    line += f'{GREEN}{name:<5}{hint}{reg.format_string():<24}{RESET}'
-                elif name == "cpsr":
-                    flags, cond = decode_cpsr(reg, False)
-                    line += f'{GREEN}{name:<5}{hint}{flags:<24}{RESET}'
-                elif name == "fpcr":
-                    st = decode_fpcr(reg)
-                    line += f'{GREEN}{name:<5}{hint}{st:<24}{RESET}'
-                elif name == "fpsr":
-                    st = decode_fpsr(reg)
-                    line += f'{GREEN}{name:<5}{hint}{st:<24}{RESET}'
-                elif reg.type.name == "__gdb_builtin_type_vnq":
-                    st = reg["u"].format_string(format="z")
-                    line += f'{GREEN}{name:<5}{hint}{st:<53}{RESET}'
-                    width = width - 29
-                elif reg.type.name == "__gdb_builtin_type_vnb":
-                    line += f'{GREEN}{name:<5}{hint}{reg["s"].format_string():<24}{RESET}'
-                elif reg.type.name == "aarch64v":
-                    st = reg["q"]["u"][0].format_string(format="z")
-                    line += f'{GREEN}{name:<5}{hint}{st:<53}{RESET}'
-                    width = width - 29
-                else:  # d or s
-                    f = reg["f"].format_string()
-                    line += f'{GREEN}{name:<5}{hint}{f:<24}{RESET}'
-                width = width - 29
-                if width < 29:
-                    line += NL
-                    self.list.append(line)
-                    line = ""
-                    width = self.tui.width
+            raw = regsnap.snapshot.read_raw(name)
+            hint = BLUE if name in self.prev and regsnap.snapshot.changed(name, self.prev[name], raw) else WHITE
+
+            self.prev[name] = raw
+
+            # an unchanged register keeps the text it was given last time
+            cell = self.cells.get(name)
+            if cell is None or cell[0] != raw or cell[1] != self.hex:
+                cell = self.cells[name] = (raw, self.hex) + self.format_reg(name, regsnap.snapshot.read(name))
+            st, cols = cell[2], cell[3]
+
+            line += f'{GREEN}{name:<5}{hint}{st}'
+            width = width - cols
+            if width < (48 if self.hex else 29):
+                line += NL
+                self.list.append(line)
+                line = ""
+                width = self.tui.width
 
         if line != "":
             line += NL
@@ -639,6 +606,63 @@ class RegWindow(object):
 
         self.render()
 
+    def format_reg(self, name, reg):
+        """(text, columns used) of the register after its name"""
+        if self.hex:
+            if reg.type.name == "long":
+                hexstr = reg.format_string(format="x")
+                return (f'{hexstr:<18} {reg.format_string():<24}{RESET}', 48)
+            elif name == "pc" or name == "sp":
+                return (f'{reg.format_string():<43}{RESET}', 48)
+            elif name == "cpsr":
+                hexstr = reg.format_string(format="x")
+                flags, cond = decode_cpsr(reg, False)
+                return (f'{hexstr:<18} {flags:<24}{RESET}', 48)
+            elif name == "fpcr":
+                hexstr = reg.format_string(format="x")
+                st = decode_fpcr(reg)
+                return (f'{hexstr:<18} {st:<24}{RESET}', 48)
+            elif name == "fpsr":
+                hexstr = reg.format_string(format="x")
+                st = decode_fpsr(reg)
+                return (f'{hexstr:<18} {st:<24}{RESET}', 48)
+            elif reg.type.name == "__gdb_builtin_type_vnq":
+                st = reg["u"].format_string(format="z")
+                return (f'{st:<43}{RESET}', 48)
+            elif reg.type.name == "__gdb_builtin_type_vnb":
+                st = reg["u"].format_string(format="x")
+                return (f'{st:<18} {reg["s"].format_string():<24}{RESET}', 48)
+            elif reg.type.name == "aarch64v":
+                st = reg["q"]["u"][0].format_string(format="z")
+                return (f'{st:<34}{RESET}         ', 48)
+            else: # s & d
+                st = reg["u"].format_string(format="x")
+                f = reg["f"].format_string()
+                return (f'{st:<18} {f:<24}{RESET}', 48)
+        else:
+            if reg.type.name == "long" or name == "pc" or name == "sp":
+                return (f'{reg.format_string():<24}{RESET}', 29)
+            elif name == "cpsr":
+                flags, cond = decode_cpsr(reg, False)
+                return (f'{flags:<24}{RESET}', 29)
+            elif name == "fpcr":
+                st = decode_fpcr(reg)
+                return (f'{st:<24}{RESET}', 29)
+            elif name == "fpsr":
+                st = decode_fpsr(reg)
+                return (f'{st:<24}{RESET}', 29)
+            elif reg.type.name == "__gdb_builtin_type_vnq":
+                st = reg["u"].format_string(format="z")
+                return (f'{st:<53}{RESET}', 58)
+            elif reg.type.name == "__gdb_builtin_type_vnb":
+                return (f'{reg["s"].format_string():<24}{RESET}', 29)
+            elif reg.type.name == "aarch64v":
+                st = reg["q"]["u"][0].format_string(format="z")
+                return (f'{st:<53}{RESET}', 58)
+            else:  # d or s
+                f = reg["f"].format_string()
+                return (f'{f:<24}{RESET}', 29)
+
     def hscroll(self, num):
         pass
 
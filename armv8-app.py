@@ -27,6 +27,10 @@
 # $5 = {u8 = {14, 190, 48, 153, 42, 232, 36, 64}, u16 = {48654, 39216, 59434, 16420}, u32 = {2570108430, 1076160554}, u64 = 46220743872453504, f32 = {-9.13736798e-24, 2.57667017}, f64 = 10.45345}`
 
 import gdb
+from os.path import abspath, dirname, join
+gdb.execute(f'source {join(dirname(abspath(__file__)), "regpath.py")}')
+
+import regsnap
 
 GREEN = "\x1b[38;5;47m"
 BLUE = "\x1b[38;5;14m"
@@ -455,7 +459,7 @@ regWinCmd = RegWinCmd()
 
 def RegWinFactory(tui):
     win = RegWindow(tui)
-    gdb.events.before_prompt.connect(win.render)
+    regsnap.snapshot.subscribe(win.render)
     regWinCmd.set_win(win)
     return win
 
@@ -469,23 +473,26 @@ class RegWindow(object):
         self.reglist = RegWindow.reglist_save
         self.prev = {}
         self.hex = False
+        regsnap.snapshot.track(self.reglist)
 
     def set_list(self, list):
+        regsnap.snapshot.untrack(self.reglist)
         self.reglist = list
+        regsnap.snapshot.track(self.reglist)
 
     def set_hex(self, hex):
         self.hex = hex
 
     def close(self):
         RegWindow.reglist_save = self.reglist
-        gdb.events.before_prompt.disconnect(self.render)
+        regsnap.snapshot.unsubscribe(self.render)
+        regsnap.snapshot.untrack(self.reglist)
 
     def render(self):
         self.tui.erase()
-        frame = gdb.selected_frame()
         width = self.tui.width
         for name in self.reglist:
-            reg = frame.read_register(name)
+            reg = regsnap.snapshot.read(name)
             if name in self.prev and self.prev[name] != reg:
                 hint = BLUE
             else:
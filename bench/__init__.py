@@ -0,0 +1 @@
+# Offline benchmarks, see __main__.py. Run from the repository root: python3 -m bench
@@ -0,0 +1,240 @@
+# Benchmark the register windows and info commands without gdb or an ARM inferior.
+#
+# python3 -m bench [-n stops] [workload ...]
+#
+# Each workload loads the scripts unchanged into a fresh stand-in gdb module (bench/gdb),
+# opens their TUI windows on a fake terminal, fills them with registers, then steps a
+# synthetic target (bench/target.py): a few registers change, gdb's stop and
+# before_prompt events are fired and the windows redraw. The info commands and the
+# vector command parser are timed after each stop too.
+#
+# The latency pass runs without tracemalloc. A second pass under tracemalloc gives
+# the peak memory allocated per stop and what is still held afterwards.
+#
+# The startup workload times how long gdb spends sourcing the aarch64 scripts, and
+# then opening their windows, against sourcing regload.py which runs them on first use.
+
+import argparse
+import contextlib
+import importlib
+import io
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from os.path import abspath, dirname, join
+
+BENCH = dirname(abspath(__file__))
+ROOT = dirname(BENCH)
+
+# the stand-in gdb and the target go ahead of anything installed, the scripts put
+# the shared modules on the path themselves through regpath.py
+sys.path.insert(0, BENCH)
+
+#--------------------------
+# workloads: name -> (target, scripts, window commands, timed commands, registers changed per stop)
+
+AARCH64 = ["general.py", "vector.py", "infogsd.py"]
+
+def vector_list(count):
+    specs = ["s.f", "b.u", "h.f", "d.u", "s.s", "d.f", "h.u", "b.s"]
+    return " ".join(f'v{i}.{specs[i % len(specs)]}' for i in range(count))
+
+WORKLOADS = {
+    "small": ("aarch64", AARCH64,
+              ["register x0 - x7 pc sp cpsr", "vector v0.s.f v1.b.u"],
+              ["info general x0 - x7", "vector v2.s.f v3.b.u", "register trace 100",
+               "register trace block 100"],
+              2),
+    "medium": ("aarch64", AARCH64,
+               ["register x0 - x30 w0 - w3 s0 - s3 d0 - d3 pc sp cpsr fpsr fpcr",
+                "vector " + vector_list(8) + " b8.u h9.f s10 d11 q12.u"],
+               ["info general", "info vector /sf v0 - v7", "vector " + vector_list(8)],
+               4),
+    "all": ("aarch64", AARCH64,
+            ["register x0 - x30 b0 - b31 h0 - h31 s0 - s31 d0 - d31 q0 - q31 v0 - v31 w0 - w30 "
+             "pc sp cpsr fpsr fpcr", "vector " + vector_list(32)],
+            ["info general", "info vector", "vector " + vector_list(32)],
+            8),
+    "riscv-small": ("riscv", ["general-riscv.py"],
+                    ["register a0 - a7 ra sp pc"],
+                    [],
+                    2),
+    "riscv-all": ("riscv", ["general-riscv.py"],
+                  ["register x0 - x31 f0 - f31 f0.s - f31.s ra sp gp tp fp pc"],
+                  [],
+                  8),
+}
+
+# how gdb starts: the aarch64 scripts sourced one by one, or regload sourced in their place
+STARTUP = {"scripts": AARCH64, "regload": ["regload.py"]}
+
+CACHE = tempfile.TemporaryDirectory(prefix="bench-registers-")
+
+SHARED = ["gdb", "target", "regrecord", "regsnap", "regtable", "regpred", "regbisect", "regvalues", "regbreak", "regtime", "regfmt", "regindex", "reghist", "regprof", "regtrace", "tracefile", "tracelog", "tuiscreen"]
+
+#--------------------------
+# a gdb session with the scripts sourced and their windows open
+
+class Tui(object):
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.title = ""
+        self.writes = 0
+        self.chars = 0
+
+    def is_valid(self):
+        return True
+
+    def erase(self):
+        pass
+
+    def write(self, text, full_window=False):
+        self.writes += 1
+        self.chars += len(text)
+
+class Session(object):
+
+    def __init__(self, arch, scripts, width, height):
+        # the scripts fall back to platform.machine() when gdb has no architecture to give
+        platform.machine = lambda: "aarch64" if arch == "aarch64" else "riscv64"
+
+        for name in SHARED:
+            sys.modules.pop(name, None)
+        self.gdb = importlib.import_module("gdb")
+        target = importlib.import_module("target")
+        self.target = target.aarch64() if arch == "aarch64" else target.riscv()
+        self.gdb.target = self.gdb.last = self.target
+
+        start = time.perf_counter()
+        for script in scripts:
+            path = join(ROOT, script)
+            g = {"__name__": "__main__", "__file__": path, "gdb": self.gdb}
+            with open(path) as f:
+                exec(compile(f.read(), path, 'exec'), g)
+        self.sourced = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.windows = [factory(Tui(width, height)) for factory in self.gdb.windows.values()]
+        self.opened = time.perf_counter() - start
+        # time every redraw rather than the ones the debounce lets through
+        sys.modules["regsnap"].snapshot.debounce = 0
+        # the register tables are saved where the run can't see a user's ones
+        sys.modules["regtable"].directory = CACHE.name
+
+    def command(self, line):
+        """run a gdb command line, the longest registered command name wins"""
+        for name in sorted(self.gdb.commands, key=len, reverse=True):
+            if line == name or line.startswith(name + " "):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    self.gdb.commands[name].invoke(line[len(name) + 1:], False)
+                return
+        raise KeyError(f"no command {line}")
+
+    def stop(self):
+        events = self.gdb.events
+        events.stop.fire(None)
+        events.before_prompt.fire()
+        self.gdb.run_posted()
+
+#--------------------------
+# measure
+
+class Phase(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.times = []
+        self.peaks = []
+        self.kept = []
+        self.reads = []
+
+    def row(self, workload):
+        times = sorted(self.times)
+        mean = sum(times) / len(times)
+        p95 = times[min(len(times) - 1, len(times) * 95 // 100)]
+        peak = sum(self.peaks) / len(self.peaks) if self.peaks else 0
+        kept = sum(self.kept) / len(self.kept) if self.kept else 0
+        reads = sum(self.reads) / len(self.reads)
+        return f'{workload:<12} {self.name:<28} {mean * 1e6:>9.1f} {p95 * 1e6:>9.1f} {peak / 1024:>9.1f} {kept:>8.0f} {reads:>6.1f}'
+
+def measure(session, phase, run, traced):
+    reads = session.target.reads
+    if traced:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        run()
+        current, peak = tracemalloc.get_traced_memory()
+        phase.peaks.append(peak - before)
+        phase.kept.append(current - before)
+    else:
+        start = time.perf_counter()
+        run()
+        phase.times.append(time.perf_counter() - start)
+        phase.reads.append(session.target.reads - reads)
+
+def run_workload(name, stops, width, height):
+    arch, scripts, setup, timed, changes = WORKLOADS[name]
+    phases = {}
+
+    for traced in (False, True):
+        session = Session(arch, scripts, width, height)
+        for line in setup:
+            session.command(line)
+        session.stop()    # first draw builds the windows and learns the types
+
+        if traced:
+            tracemalloc.start()
+        for i in range(stops):
+            session.target.step(changes, vector=i % 4 == 0)
+            measure(session, phases.setdefault("stop", Phase("stop + redraw")), session.stop, traced)
+            measure(session, phases.setdefault("idle", Phase("prompt, nothing changed")),
+                    session.gdb.events.before_prompt.fire, traced)
+            for line in timed:
+                measure(session, phases.setdefault(line, Phase(line[:28])),
+                        lambda: session.command(line), traced)
+        if traced:
+            tracemalloc.stop()
+
+    return [phase.row(name) for phase in phases.values()]
+
+def run_startup(count, width, height):
+    """time sourcing the scripts into a fresh gdb, then opening their windows"""
+    rows = []
+    for name, scripts in STARTUP.items():
+        sourced = Phase("source")
+        opened = Phase("open windows")
+        for i in range(count):
+            session = Session("aarch64", scripts, width, height)
+            for phase, seconds in ((sourced, session.sourced), (opened, session.opened)):
+                phase.times.append(seconds)
+                phase.reads.append(session.target.reads)
+        rows += [sourced.row(name), opened.row(name)]
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(prog="python3 -m bench", description="time the register windows without gdb")
+    parser.add_argument("-n", "--stops", type=int, default=200, help="stops per workload")
+    parser.add_argument("--width", type=int, default=120, help="TUI window width")
+    parser.add_argument("--height", type=int, default=40, help="TUI window height")
+    parser.add_argument("workloads", nargs="*", help=f'{", ".join(WORKLOADS)}, startup (default: all)')
+    args = parser.parse_args()
+
+    for name in args.workloads:
+        if not name in WORKLOADS and name != "startup":
+            parser.error(f'unknown workload {name}')
+
+    print(f'python {platform.python_version()}, {args.stops} stops, window {args.width}x{args.height}')
+    print(f'{"workload":<12} {"phase":<28} {"mean us":>9} {"p95 us":>9} {"peak KiB":>9} {"kept B":>8} {"reads":>6}')
+    for name in args.workloads or list(WORKLOADS) + ["startup"]:
+        if name == "startup":
+            rows = run_startup(min(args.stops, 20), args.width, args.height)
+        else:
+            rows = run_workload(name, args.stops, args.width, args.height)
+        for row in rows:
+            print(row)
+
+main()
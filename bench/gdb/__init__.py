@@ -0,0 +1,500 @@
+# Stand-in for the gdb module so the scripts can be loaded and timed without gdb.
+#
+# Only the parts of the gdb Python API the scripts use are here: types shaped like
+# gdb's register types (unions of arrays of lanes for the vector registers), Values
+# over little endian bytes, events, commands, TUI window factories and parameters.
+# The selected frame reads its registers from a bench.target.Target.
+#
+# import gdb                     # with bench/ first on sys.path
+# gdb.target = target.aarch64()
+# gdb.events.stop.fire(None)
+# gdb.events.before_prompt.fire()
+
+import struct
+import sys
+
+class error(RuntimeError):
+    pass
+
+class GdbError(Exception):
+    pass
+
+COMMAND_DATA = 1
+
+STDOUT = 0
+STDERR = 1
+
+TYPE_CODE_PTR = 1
+TYPE_CODE_ARRAY = 2
+TYPE_CODE_STRUCT = 3
+TYPE_CODE_UNION = 4
+TYPE_CODE_INT = 8
+TYPE_CODE_FLT = 9
+
+#--------------------------
+# events
+
+class EventRegistry(object):
+
+    def __init__(self):
+        self.callbacks = []
+
+    def connect(self, callback):
+        self.callbacks.append(callback)
+
+    def disconnect(self, callback):
+        self.callbacks.remove(callback)
+
+    def fire(self, *args):
+        """not in gdb: call the connected callbacks as gdb would"""
+        for callback in list(self.callbacks):
+            callback(*args)
+
+class Events(object):
+
+    def __init__(self):
+        for name in ["stop", "cont", "exited", "register_changed", "memory_changed", "inferior_call",
+                     "before_prompt", "new_objfile", "new_thread"]:
+            setattr(self, name, EventRegistry())
+
+events = Events()
+
+class StopEvent(object):
+    pass
+
+class BreakpointEvent(StopEvent):
+
+    def __init__(self, breakpoints):
+        self.breakpoints = breakpoints
+        self.breakpoint = breakpoints[0]
+
+class SignalEvent(StopEvent):
+
+    def __init__(self, stop_signal):
+        self.stop_signal = stop_signal
+
+posted = []
+
+def post_event(callback):
+    posted.append(callback)
+
+def run_posted():
+    """not in gdb: run the events posted so far, as gdb does from its event loop"""
+    while posted:
+        posted.pop(0)()
+
+#--------------------------
+# types
+
+class Field(object):
+
+    def __init__(self, name, type, bitpos=0):
+        self.name = name
+        self.type = type
+        self.bitpos = bitpos
+
+class Type(object):
+
+    def __init__(self, code, name, sizeof, fields=(), target=None, count=0, signed=False):
+        self.code = code
+        self.name = name
+        self.sizeof = sizeof
+        self.is_signed = signed
+        self._fields = list(fields)
+        self._target = target
+        self._count = count
+
+    def fields(self):
+        return self._fields
+
+    def target(self):
+        return self._target
+
+    def range(self):
+        return (0, self._count - 1)
+
+    def pointer(self):
+        return Type(TYPE_CODE_PTR, None, 8, target=self)
+
+    def strip_typedefs(self):
+        return self
+
+    def __str__(self):
+        return self.name or ""
+
+def int_type(name, size, signed):
+    return Type(TYPE_CODE_INT, name, size, signed=signed)
+
+def float_type(name, size):
+    return Type(TYPE_CODE_FLT, name, size)
+
+def array_type(target, count):
+    return Type(TYPE_CODE_ARRAY, None, target.sizeof * count, target=target, count=count)
+
+def union_type(name, fields):
+    return Type(TYPE_CODE_UNION, name, max(t.sizeof for n, t in fields), [Field(n, t) for n, t in fields])
+
+def pointer_type(name):
+    return Type(TYPE_CODE_PTR, name, 8)
+
+long_type = int_type("long", 8, True)
+double_type = float_type("double", 8)
+
+#--------------------------
+# values
+
+FLOAT_CODE = {2: 'e', 4: 'f', 8: 'd'}
+
+# exponent bits, mantissa bits, %g precision
+FLOAT_LAYOUT = {2: (5, 10, 5), 4: (8, 23, 9), 8: (11, 52, 17)}
+BFLOAT16_LAYOUT = (8, 7, 4)
+
+def unpack(type, raw):
+    if type.code == TYPE_CODE_FLT:
+        if type.name == "bfloat16":
+            return struct.unpack('<f', b"\0\0" + raw[:2])[0]
+        return struct.unpack('<' + FLOAT_CODE[type.sizeof], raw[:type.sizeof])[0]
+    return int.from_bytes(raw[:type.sizeof], 'little', signed=bool(type.is_signed))
+
+def format_float(type, raw):
+    size = type.sizeof
+    exp_len, man_len, digits = BFLOAT16_LAYOUT if type.name == "bfloat16" else FLOAT_LAYOUT[size]
+    bits = int.from_bytes(raw[:size], 'little')
+    if (bits >> man_len) & ((1 << exp_len) - 1) == (1 << exp_len) - 1:
+        sign = "-" if bits >> (size * 8 - 1) else ""
+        mantissa = bits & ((1 << man_len) - 1)
+        if mantissa == 0:
+            return sign + "inf"
+        first = man_len % 32 or 32
+        st = f'{mantissa >> (man_len - first):x}'
+        for shift in range(man_len - first - 32, -1, -32):
+            st += f'{(mantissa >> shift) & 0xffffffff:08x}'
+        return f'{sign}nan(0x{st})'
+
+    return '%.*g' % (digits, unpack(type, raw))
+
+def format_value(type, raw, format, repeats):
+    """close enough to gdb's value printing for the scripts to do the same work"""
+    if type.code in (TYPE_CODE_UNION, TYPE_CODE_STRUCT):
+        return "{" + ", ".join(f'{f.name} = {format_value(f.type, raw[f.bitpos // 8:], format, repeats)}'
+                               for f in type.fields()) + "}"
+
+    if type.code == TYPE_CODE_ARRAY:
+        lane = type.target()
+        size = lane.sizeof
+        count = type.range()[1] + 1
+        items = [format_value(lane, raw[i * size:], format, repeats) for i in range(count)]
+        out = []
+        i = 0
+        while i < count:
+            reps = 1
+            while i + reps < count and items[i + reps] == items[i]:
+                reps += 1
+            if repeats and reps > repeats:
+                out.append(f'{items[i]} <repeats {reps} times>')
+                i += reps
+            else:
+                out.append(items[i])
+                i += 1
+        return "{" + ", ".join(out) + "}"
+
+    bits = int.from_bytes(raw[:type.sizeof], 'little')
+    if format == 'z':
+        return f'0x{bits:0{type.sizeof * 2}x}'
+    elif format in ('x', 'a') or type.code == TYPE_CODE_PTR:
+        return f'0x{bits:x}'
+    elif format == 't':
+        return f'{bits:b}'
+    elif type.code == TYPE_CODE_FLT:
+        return format_float(type, raw)
+
+    return str(unpack(type, raw))
+
+class Value(object):
+
+    def __init__(self, val, type=None):
+        if type is None:
+            if isinstance(val, Value):
+                type, val = val.type, val._raw
+            elif isinstance(val, float):
+                type, val = double_type, struct.pack('<d', val)
+            else:
+                type, val = long_type, (int(val) & (1 << 64) - 1).to_bytes(8, 'little')
+        self.type = type
+        self._raw = bytes(val[:type.sizeof])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for field in self.type.fields():
+                if field.name == key:
+                    offset = field.bitpos // 8
+                    return Value(self._raw[offset:offset + field.type.sizeof], field.type)
+            raise error(f"There is no member named {key}.")
+
+        lane = self.type.target()
+        return Value(self._raw[key * lane.sizeof:(key + 1) * lane.sizeof], lane)
+
+    @property
+    def bytes(self):
+        return self._raw
+
+    def python(self):
+        return unpack(self.type, self._raw)
+
+    def __int__(self):
+        return int(self.python())
+
+    def __float__(self):
+        return float(self.python())
+
+    def __index__(self):
+        return int(self)
+
+    def __bool__(self):
+        return self.python() != 0
+
+    def __eq__(self, other):
+        if other is None:
+            return False
+        if isinstance(other, Value):
+            return self._raw == other._raw
+        return self.python() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        return self.python() < (other.python() if isinstance(other, Value) else other)
+
+    def __gt__(self, other):
+        return self.python() > (other.python() if isinstance(other, Value) else other)
+
+    def __hash__(self):
+        return hash(self._raw)
+
+    def __and__(self, other):
+        return Value(int(self) & int(other))
+
+    def __or__(self, other):
+        return Value(int(self) | int(other))
+
+    __rand__ = __and__
+    __ror__ = __or__
+
+    def cast(self, type):
+        return Value(self._raw.ljust(type.sizeof, b"\0"), type)
+
+    def format_string(self, format=None, repeat_threshold=None, **kwargs):
+        if repeat_threshold is None:
+            repeat_threshold = parameters["print repeats"]
+        return format_value(self.type, self._raw, format, repeat_threshold)
+
+    def __str__(self):
+        return self.format_string()
+
+#--------------------------
+# inferior
+
+target = None    # bench.target.Target of the selected frame, None when nothing is running
+last = None      # the Target last run, the inferior keeps its architecture after it exits
+
+class RegisterDescriptor(object):
+
+    def __init__(self, name):
+        self.name = name
+
+class RegisterGroup(object):
+
+    def __init__(self, name):
+        self.name = name
+
+class RegisterDescriptorIterator(object):
+
+    def __init__(self, names):
+        self.names = names
+
+    def __iter__(self):
+        return (RegisterDescriptor(name) for name in self.names)
+
+    def find(self, name):
+        return RegisterDescriptor(name) if name in self.names else None
+
+class Architecture(object):
+
+    def __init__(self, target):
+        self.target = target
+
+    def name(self):
+        return self.target.arch
+
+    def registers(self, reggroup=None):
+        """the target's registers without the user aliases, general ones are no wider than 8 bytes"""
+        names = [name for name in self.target.registers if not name in self.target.user]
+        if reggroup == "general":
+            names = [name for name in names if self.target.registers[name][2].sizeof <= 8]
+        elif reggroup == "vector":
+            names = [name for name in names if self.target.registers[name][2].sizeof > 8]
+        return RegisterDescriptorIterator(names)
+
+    def register_groups(self):
+        return [RegisterGroup(name) for name in ("all", "general", "vector")]
+
+    def integer_type(self, size, signed=True):
+        return int_type(f'{"" if signed else "u"}int{size}_t', size // 8, signed)
+
+    def disassemble(self, start_pc, end_pc=None, count=None):
+        insns = []
+        addr = start_pc
+        while (count is None or len(insns) < count) and (end_pc is None or addr <= end_pc):
+            insns.append({'addr': addr, 'asm': self.target.instruction(addr), 'length': 4})
+            addr += 4
+            if count is None and end_pc is None:
+                break
+        return insns
+
+architectures = {}    # Target -> Architecture, gdb keeps one per gdbarch
+
+def architecture(target):
+    if not target in architectures:
+        architectures[target] = Architecture(target)
+    return architectures[target]
+
+class Frame(object):
+
+    def __init__(self, target, level=0):
+        self.target = target
+        self._level = level
+
+    def read_register(self, register):
+        return self.target.read(getattr(register, "name", register))
+
+    def architecture(self):
+        return architecture(self.target)
+
+    def pc(self):
+        return self.target.pc()
+
+    def is_valid(self):
+        return True
+
+    def level(self):
+        return self._level
+
+    def __eq__(self, other):
+        return isinstance(other, Frame) and self.target is other.target and self._level == other._level
+
+    def __hash__(self):
+        return id(self.target)
+
+class InferiorThread(object):
+
+    global_num = 1
+    num = 1
+
+    def is_valid(self):
+        return True
+
+    def is_running(self):
+        return False
+
+def selected_frame():
+    if target is None:
+        raise error("No frame selected.")
+    return Frame(target)
+
+def selected_thread():
+    return InferiorThread() if target is not None else None
+
+class Inferior(object):
+
+    def architecture(self):
+        return architecture(target or last)
+
+def selected_inferior():
+    return Inferior()
+
+#--------------------------
+# commands, windows and settings
+
+commands = {}
+windows = {}
+parameters = {"print repeats": 10, "print elements": 200, "print pretty": False, "print union": True}
+executed = []
+
+class Command(object):
+
+    def __init__(self, name, command_class, completer_class=None, prefix=False):
+        commands[name] = self
+
+def string_to_argv(arguments):
+    return arguments.split()
+
+def register_window_type(name, factory):
+    windows[name] = factory
+
+def parameter(name):
+    return parameters.get(name)
+
+breakpoints = []
+
+class Breakpoint(object):
+
+    def __init__(self, spec, type=None, wp_class=None, internal=False, temporary=False):
+        if not spec.startswith("*"):
+            raise error(f"Function \"{spec}\" not defined.")
+        self.location = spec
+        self.address = int(spec[1:], 0)
+        self.temporary = temporary
+        self.enabled = True
+        breakpoints.append(self)
+
+    def is_valid(self):
+        return self in breakpoints
+
+    def delete(self):
+        breakpoints.remove(self)
+
+    def stop(self):
+        return True
+
+def execute(command, from_tty=False, to_string=False):
+    executed.append(command)
+    if command == "show endian":
+        return "The target endianness is set automatically (currently little endian).\n"
+    elif command.startswith("source ") and command.endswith(".py"):
+        path = command[len("source "):]
+        with open(path) as f:
+            exec(compile(f.read(), path, 'exec'), {"__name__": "__main__", "__file__": path, "gdb": sys.modules[__name__]})
+    elif command == "stepi":
+        if target is None:
+            raise error("The program is not being run.")
+        target.stepi()
+        events.stop.fire(None)
+    elif command == "continue":
+        if target is None:
+            raise error("The program is not being run.")
+        while True:
+            target.cont({bp.address for bp in breakpoints if bp.enabled})
+            hit = [bp for bp in breakpoints if bp.address == target.pc()]
+            if not hit or any(bp.stop() for bp in hit):
+                break
+        for bp in hit:
+            if bp.temporary:
+                bp.delete()
+        events.stop.fire(None)
+    else:
+        # a command the scripts registered, the longest name wins
+        for name in sorted(commands, key=len, reverse=True):
+            if command == name or command.startswith(name + " "):
+                commands[name].invoke(command[len(name) + 1:], from_tty)
+                break
+    return "" if to_string else None
+
+def write(text, stream=None):
+    sys.stdout.write(text)
+
+def flush(stream=None):
+    sys.stdout.flush()
+
+def current_objfile():
+    return None
@@ -0,0 +1,167 @@
+# Synthetic register files for the benchmarks.
+#
+# A Target holds the physical registers as integers and answers read_register with
+# a gdb.Value of the type gdb gives that register, cut from the physical register
+# the way the hardware aliases them (w3 is the low half of x3, s3 the low word of v3).
+# step() changes a few registers, the way a short run would, stepi() moves the pc
+# on and changes one or two. The code at the pc is straight-line with a branch to
+# the next instruction every eight.
+#
+# target = bench.target.aarch64()
+# target.step(3)
+
+import random
+
+import gdb
+
+class Target(object):
+
+    def __init__(self, arch, seed=1):
+        self.arch = arch
+        self.physical = {}   # physical register -> (size, int)
+        self.registers = {}  # name -> (physical register, offset, gdb.Type)
+        self.user = set()    # names gdb knows as user aliases rather than registers
+        self.random = random.Random(seed)
+        self.reads = 0
+        self.insn = "add\tx1, x1, #0x1" if arch == "aarch64" else "addi\ta0, a0, 1"
+        self.branch = "b.ne" if arch == "aarch64" else "bnez\ta0,"
+
+    def add_physical(self, name, size):
+        self.physical[name] = (size, self.random.getrandbits(size * 8))
+
+    def add_register(self, name, physical, type, offset=0, user=False):
+        self.registers[name] = (physical, offset, type)
+        if user:
+            self.user.add(name)
+
+    def read(self, name):
+        try:
+            physical, offset, type = self.registers[name]
+        except KeyError:
+            raise ValueError("Bad register")
+
+        self.reads += 1
+        size, bits = self.physical[physical]
+        raw = bits.to_bytes(size, 'little')
+        return gdb.Value(raw[offset:offset + type.sizeof], type)
+
+    def pc(self):
+        return self.physical["pc"][1]
+
+    def instruction(self, addr):
+        """the text of the instruction at addr: straight-line code with a branch every 8th word"""
+        if addr // 4 % 8 == 7:
+            return f'{self.branch}\t{addr + 4:#x}'
+        return self.insn
+
+    def stepi(self):
+        """one instruction: the pc moves on and a register or two change"""
+        size, pc = self.physical["pc"]
+        self.physical["pc"] = (size, (pc + 4) & ((1 << size * 8) - 1))
+        self.step(self.random.randint(1, 2), vector=self.random.random() < 0.2)
+
+    def cont(self, breakpoints, limit=100000):
+        """run until the pc reaches one of the breakpoint addresses"""
+        for i in range(limit):
+            self.stepi()
+            if self.pc() in breakpoints:
+                return
+
+    def step(self, count, vector=False):
+        """change count random physical registers, vector ones too if vector"""
+        names = [name for name, (size, bits) in self.physical.items() if (vector or size <= 8) and name != "pc"]
+        for name in self.random.sample(names, min(count, len(names))):
+            size = self.physical[name][0]
+            self.physical[name] = (size, self.random.getrandbits(size * 8))
+
+#--------------------------
+# AArch64
+
+def aarch64_types():
+    I, F, A, U = gdb.int_type, gdb.float_type, gdb.array_type, gdb.union_type
+    u8, s8 = I("uint8_t", 1, False), I("int8_t", 1, True)
+    u16, s16 = I("uint16_t", 2, False), I("int16_t", 2, True)
+    u32, s32 = I("uint32_t", 4, False), I("int32_t", 4, True)
+    u64, s64 = I("uint64_t", 8, False), I("int64_t", 8, True)
+    u128, s128 = I("uint128_t", 16, False), I("int128_t", 16, True)
+    f16, f32, f64, bf16 = F("half", 2), F("float", 4), F("double", 8), F("bfloat16", 2)
+
+    vnd = U("vnd", [("f", A(f64, 2)), ("u", A(u64, 2)), ("s", A(s64, 2))])
+    vns = U("vns", [("f", A(f32, 4)), ("u", A(u32, 4)), ("s", A(s32, 4))])
+    vnh = U("vnh", [("bf", A(bf16, 8)), ("f", A(f16, 8)), ("u", A(u16, 8)), ("s", A(s16, 8))])
+    vnb = U("vnb", [("u", A(u8, 16)), ("s", A(s8, 16))])
+    vnq = U("vnq", [("u", A(u128, 1)), ("s", A(s128, 1))])
+
+    return {
+        'x': gdb.long_type,
+        'w': I("int", 4, True),
+        'v': U("aarch64v", [("d", vnd), ("s", vns), ("h", vnh), ("b", vnb), ("q", vnq)]),
+        'q': U("__gdb_builtin_type_vnq", [("u", u128), ("s", s128)]),
+        'd': U("__gdb_builtin_type_vnd", [("f", f64), ("u", u64), ("s", s64)]),
+        's': U("__gdb_builtin_type_vns", [("f", f32), ("u", u32), ("s", s32)]),
+        'h': U("__gdb_builtin_type_vnh", [("bf", bf16), ("f", f16), ("u", u16), ("s", s16)]),
+        'b': U("__gdb_builtin_type_vnb", [("u", u8), ("s", s8)]),
+        'pc': gdb.pointer_type("code_ptr"),
+        'sp': gdb.pointer_type("data_ptr"),
+        'cpsr': I("cpsr_flags", 4, False),
+        'fpsr': I("fpsr_flags", 4, False),
+        'fpcr': I("fpcr_flags", 4, False),
+    }
+
+def aarch64(seed=1):
+    target = Target("aarch64", seed)
+    types = aarch64_types()
+
+    for i in range(31):
+        target.add_physical(f'x{i}', 8)
+        target.add_register(f'x{i}', f'x{i}', types['x'])
+        target.add_register(f'w{i}', f'x{i}', types['w'])
+    target.add_register("lr", "x30", types['x'], user=True)
+
+    for i in range(32):
+        target.add_physical(f'v{i}', 16)
+        for reg in "vqdshb":
+            target.add_register(f'{reg}{i}', f'v{i}', types[reg])
+
+    for name in ["pc", "sp", "cpsr", "fpsr", "fpcr"]:
+        target.add_physical(name, 8 if name in ("pc", "sp") else 4)
+        target.add_register(name, name, types[name])
+
+    return target
+
+#--------------------------
+# RISC-V rv64 with 64 bit floating point registers
+
+RISCV_ABI = {"ra": 1, "sp": 2, "gp": 3, "tp": 4, "fp": 8}
+RISCV_ABI.update({f'a{i}': 10 + i for i in range(8)})
+RISCV_ABI.update({f's{i}': (8 + i if i < 2 else 16 + i) for i in range(12)})
+RISCV_ABI.update({f't{i}': (5 + i if i < 3 else 25 + i) for i in range(7)})
+
+RISCV_FABI = {f'fa{i}': 10 + i for i in range(8)}
+RISCV_FABI.update({f'fs{i}': (8 + i if i < 2 else 16 + i) for i in range(12)})
+RISCV_FABI.update({f'ft{i}': (i if i < 8 else 20 + i) for i in range(12)})
+
+def riscv(seed=1):
+    target = Target("riscv:rv64", seed)
+    freg = gdb.union_type("riscv_double_reg", [("float", gdb.float_type("float", 4)),
+                                               ("double", gdb.float_type("double", 8))])
+    code_ptr = gdb.pointer_type("code_ptr")
+    data_ptr = gdb.pointer_type("data_ptr")
+
+    for i in range(32):
+        target.add_physical(f'x{i}', 8)
+        target.add_register(f'x{i}', f'x{i}', gdb.long_type)
+        target.add_physical(f'f{i}', 8)
+        target.add_register(f'f{i}', f'f{i}', freg)
+
+    for name, num in RISCV_ABI.items():
+        type = code_ptr if name == "ra" else data_ptr if name in ("sp", "gp", "tp", "fp") else gdb.long_type
+        target.add_register(name, f'x{num}', type, user=True)
+
+    for name, num in RISCV_FABI.items():
+        target.add_register(name, f'f{num}', freg, user=True)
+
+    target.add_physical("pc", 8)
+    target.add_register("pc", "pc", code_ptr)
+
+    return target
@@ -1,3 +1,8 @@
+from os.path import abspath, dirname, join
+gdb.execute(f'source {join(dirname(abspath(__file__)), "regpath.py")}')
+
+import regsnap
+
 #--------------------------
 # Colours
 
@@ -45,11 +50,10 @@ registers = reg_rv64
 
 class Register(object):
 
-    frame = None
-
     def __init__(self, name):
         self.name = name
         self.val = None
+        self.raw = None
         self.fmt = None
         self.colour = WHITE
 
@@ -67,9 +71,11 @@ class Register(object):
         return self.val.format_string(format=self.fmt)
 
     def value(self):
-        val = Register.frame.read_register(self.name)
-        self.colour = BLUE if self.val != val else WHITE
-        self.val = val
+        # compare the raw bytes, a gdb.Value != goes through the expression evaluator
+        raw = regsnap.snapshot.read_raw(self.name)
+        self.colour = BLUE if regsnap.snapshot.changed(self.name, self.raw, raw) else WHITE
+        self.raw = raw
+        self.val = regsnap.snapshot.read(self.name)
 
 class XReg(Register):
 
@@ -263,7 +269,7 @@ regWinCmd = RegisterCmd()
 
 def RegisterFactory(tui):
     win = RegisterWindow(tui)
-    gdb.events.before_prompt.connect(win.create_register)
+    regsnap.snapshot.subscribe(win.create_register)
     regWinCmd.set_win(win)
     return win
 
@@ -277,10 +283,17 @@ class RegisterWindow(object):
         self.regs = RegisterWindow.regs_save
         self.start = 0
         self.tui_list = []
+        self.generation = None
+        self.width = None
+        regsnap.snapshot.track([reg.name for reg in self.regs.values()])
 
     def fclass_registers(self, list):
         for name in list:
+            if name in self.regs:
+                regsnap.snapshot.untrack([self.regs[name].name])
             self.regs[name] = FClass(name)
+            regsnap.snapshot.track([self.regs[name].name])
+        self.generation = None
         # todo check for XReg type 
 
     def add_registers(self, list):
@@ -288,13 +301,16 @@ class RegisterWindow(object):
             if not name in self.regs:
                 try:
                     self.regs[name] = Register.Factory(name)
+                    regsnap.snapshot.track([self.regs[name].name])
+                    self.generation = None
                 except:
                     print(f'register: invalid register {name}.')
             
     def del_registers(self, list):
         for name in list:
             try:
-                del self.regs[name]
+                regsnap.snapshot.untrack([self.regs.pop(name).name])
+                self.generation = None
             except:
                print(f'register del {name} not found')
 
@@ -305,8 +321,12 @@ class RegisterWindow(object):
 
             self.regs[name].fmt = format
 
+        self.generation = None
+
     def clear_registers(self):
+        regsnap.snapshot.untrack([reg.name for reg in self.regs.values()])
         self.regs.clear()
+        self.generation = None
 
     def save_registers(self, filename):
         try:
@@ -319,7 +339,8 @@ class RegisterWindow(object):
 
     def close(self):
         RegisterWindow.regs_save = self.regs
-        gdb.events.before_prompt.disconnect(self.create_register)
+        regsnap.snapshot.unsubscribe(self.create_register)
+        regsnap.snapshot.untrack([reg.name for reg in self.regs.values()])
 
     def render(self):
         if not self.tui.is_valid():
@@ -331,13 +352,20 @@ class RegisterWindow(object):
             self.tui.write(l)
 
     def create_register(self):
-        self.tui_list = []
-
         if not self.tui.is_valid():
+            self.tui_list = []
             return
-        
+
+        if self.generation == regsnap.snapshot.generation and self.width == self.tui.width:
+            self.render()
+            return
+
+        self.tui_list = []
+        self.generation = regsnap.snapshot.generation
+        self.width = self.tui.width
+
         try:
-            Register.frame = gdb.selected_frame()
+            regsnap.snapshot.selected_frame()
         except gdb.error:
             self.start = 0
             self.title = "No Frame"
@@ -1,4 +1,21 @@
-from platform import machine
+from os.path import abspath, dirname, join
+gdb.execute(f'source {join(dirname(abspath(__file__)), "regpath.py")}')
+
+import regsnap
+import regtable
+import regtime
+import regfmt
+import regbisect
+import regbreak
+import regindex
+import reghist
+import regpred
+import regprof
+import regtrace
+import tracefile
+import tracelog
+import tuiscreen
+
 #--------------------------
 # Colours
 
@@ -60,20 +77,23 @@ reg_armv8a = {"r0": 0, "r1": 1, "r2": 2, "r3": 3, "r4": 4, "r5": 5, "r6": 6, "r7
        "q9": 86, "q10": 87, "q11": 88, "q12": 89, "q13": 90, "q14": 91, "q15": 92,
        "lr": 93, "pc": 94, "sp": 95, "cpsr": 96, "fpscr": 97}
 
-registers = reg_aarch64 if machine() == "aarch64" else reg_armv8a
+# the target's architecture, which for a remote or cross target is not the machine gdb runs on
+aarch64 = regtable.architecture().startswith("aarch64")
+registers = reg_aarch64 if aarch64 else reg_armv8a
 
 #--------------------------
 # class view of registers for formatting
 
 class Register(object):
 
-    frame = None
-
     def __init__(self, name):
         self.name = name
         self.val = None
         self.fmt = 'd'
         self.colour = WHITE
+        self.raw = None
+        self.key = None
+        self.text = ""
 
     @classmethod
     def Factory(self, name):
@@ -87,14 +107,29 @@ class Register(object):
 
     def __format__(self, format_spec):
         return self.colour + format(str(self), format_spec)
-         
+
     def __str__(self):
+        # an unchanged register keeps its text, a changed one is looked up by value
+        key = (self.raw, self.fmt)
+        if key != self.key:
+            self.key = key
+            try:
+                self.text = regfmt.format_cache.get((type(self), self.raw, self.fmt), self.to_string)
+            except gdb.error:
+                # no type with the register's fields, a trace file browsed before any register was read
+                self.key = None
+                self.text = "0x" + self.raw[::-1].hex()
+        return self.text
+
+    def to_string(self):
         return self.val.format_string(format=self.fmt)
 
     def value(self):
-        val = Register.frame.read_register(self.name)
-        self.colour = BLUE if self.val != val else WHITE
-        self.val = val
+        # compare the raw bytes, a gdb.Value != goes through the expression evaluator
+        raw = regsnap.snapshot.read_raw(self.name)
+        self.colour = BLUE if regsnap.snapshot.changed(self.name, self.raw, raw) else WHITE
+        self.raw = raw
+        self.val = regsnap.snapshot.read(self.name)
         return self.val
 
     def is_vector(self):
@@ -109,7 +144,7 @@ class HSDReg(Register):
         super().__init__(name)
         self.fmt = 'f'
 
-    def __str__(self):
+    def to_string(self):
         if self.fmt == 'd': 
             self.fmt = 's'
         if self.fmt in ['s', 'u', 'f']:
@@ -119,7 +154,7 @@ class HSDReg(Register):
 
 class BReg(Register):
 
-    def __str__(self):
+    def to_string(self):
         return self.val['u'].format_string(format=self.fmt)
 
 class QReg(Register):
@@ -127,7 +162,7 @@ class QReg(Register):
     def __format__(self, format_spec):
         return self.colour + format(str(self), "<53")
 
-    def __str__(self):
+    def to_string(self):
         return self.val['u'].format_string(format=self.fmt)
 
     def is_vector(self):
@@ -138,7 +173,7 @@ class VReg(Register):
     def __format__(self, format_spec):
         return self.colour + format(str(self), "<53")
 
-    def __str__(self):
+    def to_string(self):
         return self.val['q']['u'][0].format_string(format=self.fmt)
 
     def is_vector(self):
@@ -152,33 +187,30 @@ class PCReg(Register):
 
 class FPCRReg(Register):
 
-    def __str__(self):
+    def to_string(self):
         flags = decode_fpcr(self.val)
         hex = True if self.fmt == "z" or self.fmt == 'x' else False
         return self.val.format_string(format='z') + " " + flags if hex else flags
 
 class FPSRReg(Register):
 
-    def __str__(self):
+    def to_string(self):
         flags = decode_fpsr(self.val)
         hex = True if self.fmt == "z" or self.fmt == 'x' else False
         return self.val.format_string(format='z') + " " + flags if hex else flags
 
 class CPSRReg(Register):
 
-    def __str__(self):
+    def to_string(self):
         flags, st = decode_cpsr(self.val, False)
         hex = True if self.fmt == "z" or self.fmt == 'x' else False
         return self.val.format_string(format='z') + " " + flags + st if hex else flags + st
 
-# used to print floats in hex by casting the value to a pointer. We could use any pointer type really.
-type_ptr_double = gdb.Value(0.0).type.pointer()
-
 class SReg(Register):
 
-    def __str__(self):
+    def to_string(self):
         hex = True if self.fmt == "z" or self.fmt == 'x' else False
-        return self.val.cast(type_ptr_double).format_string(format="z") if hex else self.val.format_string()
+        return self.val.cast(regfmt.double_pointer()).format_string(format="z") if hex else self.val.format_string()
 
 class DReg(Register):
 
@@ -186,7 +218,7 @@ class DReg(Register):
         super().__init__(name)
         self.fmt = 'f'
 
-    def __str__(self):
+    def to_string(self):
         return self.val['u64'].format_string(format=self.fmt)
         # return self.val['u64'].format_string(format="z") if self.hex else self.val['f64'].format_string()
 
@@ -195,7 +227,7 @@ class Qav8Reg(Register):
     def __format__(self, format_spec):
         return self.colour + format(str(self), "<53")
 
-    def __str__(self):
+    def to_string(self):
         return self.val["u64"][1].format_string(format="z") + " " + self.val["u64"][0].format_string(format="z")
 
     def is_vector(self):
@@ -207,7 +239,7 @@ class WReg(Register):
         self.val = super().value() & 0xffffffff
         return self.val
 
-    def __str__(self):
+    def to_string(self):
         if self.fmt == 'd' and self.val > 0x7fffffff:
             self.val = self.val | 0xffffffff00000000
 
@@ -215,12 +247,12 @@ class WReg(Register):
 
 class FPSCRReg(Register):
 
-    def __str__(self):
+    def to_string(self):
         flags, st = decode_fpscr(self.val)
         hex = True if self.fmt == "z" or self.fmt == 'x' else False
         return " " + self.val.format_string(format='z') + " " + flags if hex else " " + flags + st
 
-if machine() == "aarch64":
+if aarch64:
     reg_class = {'x': XReg, 's': HSDReg, 'd': HSDReg, 'h': HSDReg, 'b': BReg, 'q': QReg, 'v': VReg, 'w': WReg}
     reg_special = {'lr': PCReg, 'pc': PCReg, 'sp': PCReg, 'cpsr': CPSRReg, 'fpsr': FPSRReg, 'fpcr': FPCRReg}
 else:
@@ -325,13 +357,27 @@ def decode_fpscr(reg):
 
      mode = RM_MASK & reg
      if mode == RN_FLAG: str += " RN"
-     elif mode == RP_FLAG: str += "RP"
-     elif mode == RM_FLAG: str += "RM"
-     else: str += "RZ"
+     elif mode == RP_FLAG: str += " RP"
+     elif mode == RM_FLAG: str += " RM"
+     else: str += " RZ"
 
      if (reg & DZE_FLAG) == DZE_FLAG: str += " DZE"
 
      return flags, str
+
+# flags the change index keeps for the system registers, as decoded for the window
+def cpsr_flags(bits):
+    flags, st = decode_cpsr(bits, True)
+    return [flag for flag in (flags + " " + st).split() if flag != "-"]
+
+def fpscr_flags(bits):
+    flags, st = decode_fpscr(bits)
+    return (flags + " " + st).split()
+
+if aarch64:
+    regindex.index.decoders = {'cpsr': cpsr_flags, 'fpsr': lambda bits: decode_fpsr(bits).split()}
+else:
+    regindex.index.decoders = {'cpsr': cpsr_flags, 'fpscr': fpscr_flags}
 #--------------------------
 # Register command and Register Window
 
@@ -345,22 +391,26 @@ OPT: del register-list
 Ranges can be specified with -"""
 
     def __init__(self):
-        if machine() == "aarch64":
+        if aarch64:
             self.__doc__ += "\nregister x0 x10 - x15 s0 s4 - s6 d5 - d9 w0 w10 - w15\nSpecial registers: lr, pc, sp, cpsr, fpsr, fpcr"
         else:
             self.__doc__ += "\nregister r0 r10 - r15 s0 s4 - s6 d5 - d9\nSpecial registers: lr, pc, sp, cpsr, fpscr"
  
-        super(RegisterCmd, self).__init__("register", gdb.COMMAND_DATA)
+        super(RegisterCmd, self).__init__("register", gdb.COMMAND_DATA, prefix=True)
         self.win = None
+        self.log_sync = "close"
+        self.log_full = "block"
 
     def set_win(self, win):
         self.win = win
 
-    def invoke(self, arguments, from_tty):
+    def window(self):
+        """the register window, None when it is not open"""
         if self.win == None:
             print("register: Tui Window not active.")
-            return
-     
+        return self.win
+
+    def invoke(self, arguments, from_tty):
         reg_list = []
         prev = None
         expand = False
@@ -385,7 +435,8 @@ Ranges can be specified with -"""
                 print(f'register /FMT register-list')
                 return
         elif args[0] == "clear":
-            self.win.clear_registers()
+            if self.window():
+                self.win.clear_registers()
             return
         elif args[0] == "del":
             if argc > 1:
@@ -396,12 +447,16 @@ Ranges can be specified with -"""
                 return
         elif args[0] == 'save':
             if argc == 2:
-                self.win.save_registers(args[1])
+                if self.window():
+                    self.win.save_registers(args[1])
                 return
             else:
                 print("register save filename")
                 return
-            
+
+        if not self.window():
+            return
+
         for reg in args:
             if reg == "-":
                 expand = True
@@ -422,6 +477,11 @@ Ranges can be specified with -"""
                 prev = reg
                 reg_list.append(reg)
 
+        missing = [reg for reg in reg_list if not delete and not regsnap.snapshot.has(reg)]
+        if missing:
+            print(f'register: the target has no register {" ".join(missing)}')
+            return
+
         if delete:
             self.win.del_registers(reg_list)
         elif format is not None:
@@ -429,30 +489,491 @@ Ranges can be specified with -"""
         else:
             self.win.add_registers(reg_list)
 
+    def cache(self, args):
+        cache = regfmt.format_cache
+        if len(args) == 1:
+            if args[0].isdigit() and int(args[0]) > 0:
+                cache.resize(int(args[0]))
+            else:
+                print(f'register cache size: positive number expected: {args[0]}')
+                return
+        elif len(args) > 1:
+            print("register cache [size]")
+            return
+        print(f'register cache: size {len(cache.cache)}/{cache.maxsize} hits {cache.hits} misses {cache.misses}')
+
+    def refresh(self, args):
+        snapshot = regsnap.snapshot
+        if len(args) == 1 and args[0] == 'off':
+            snapshot.debounce = None
+        elif len(args) == 1:
+            if args[0].isdigit():
+                snapshot.debounce = int(args[0]) / 1000
+            else:
+                print(f'register refresh: milliseconds or off expected: {args[0]}')
+                return
+        elif len(args) > 1:
+            print("register refresh [ms|off]")
+            return
+        every = f'every {snapshot.debounce * 1000:.0f} ms' if snapshot.debounce is not None else "at every prompt"
+        print(f'register refresh: {every}, {snapshot.draws} draws, {snapshot.coalesced} stops skipped')
+
+    def budget(self, args):
+        snapshot = regsnap.snapshot
+        if len(args) == 1 and args[0] == 'off':
+            snapshot.budget = None
+        elif len(args) == 1:
+            if args[0].isdigit() and int(args[0]) > 0:
+                snapshot.budget = int(args[0]) / 1000
+            else:
+                print(f'register budget: milliseconds or off expected: {args[0]}')
+                return
+        elif len(args) > 1:
+            print("register budget [ms|off]")
+            return
+        limit = f'{snapshot.budget * 1000:.0f} ms per draw' if snapshot.budget is not None else "off"
+        print(f'register budget: {limit}, {snapshot.slices} slices, longest {snapshot.longest * 1000:.1f} ms')
+
+    def table(self, args):
+        if len(args) > 1:
+            print("register table [group]")
+            return
+        try:
+            regsnap.snapshot.check()
+            regsnap.snapshot.selected_frame()
+        except gdb.error as err:
+            print(f'register table: {err}')
+            return
+        table = regsnap.snapshot.table
+        if table is None:
+            print("register table: this gdb can't list the target's registers, they are read by name")
+        elif len(args) == 0:
+            print(f'register table: {table.summary()}')
+        elif args[0] in table.groups:
+            print(" ".join(table.groups[args[0]]))
+        else:
+            print(f'register table: no group {args[0]}: {" ".join(table.groups)}')
+
+    def replay(self, args):
+        replay = regsnap.snapshot.replay
+        if len(args) == 1 and args[0] == 'clear':
+            replay.clear()
+        elif len(args) == 1:
+            if args[0].isdigit() and int(args[0]) > 0:
+                replay.resize(int(args[0]))
+            else:
+                print(f'register replay size: positive number expected: {args[0]}')
+                return
+        elif len(args) > 1:
+            print("register replay [size|clear]")
+            return
+        print(f'register replay: {replay.summary()}')
+
+    def profile(self, args):
+        profiler = regprof.profiler
+        argc = len(args)
+        if argc == 0:
+            print(profiler.summary())
+        elif args[0] == 'on' and argc < 3:
+            if argc == 2 and not (args[1].isdigit() and int(args[1]) > 0):
+                print(f'register profile on stops: positive number expected: {args[1]}')
+                return
+            profiler.enable(int(args[1]) if argc == 2 else None)
+        elif args[0] == 'off' and argc == 1:
+            profiler.disable()
+        elif args[0] == 'clear' and argc == 1:
+            profiler.clear()
+        else:
+            print("register profile [on [stops]|off|clear]")
+
+    def history(self, args):
+        history = reghist.history
+        argc = len(args)
+        for arg in args[1:]:
+            if not arg.isdigit():
+                print(f'register history: number expected: {arg}')
+                return
+
+        if argc == 0:
+            state = "on" if history.enabled else "off"
+            print(f'register history {state}: {len(history)}/{history.capacity} stops, '
+                  f'{len(history.columns)} registers, {history.memory() / 1024:.1f} KiB')
+        elif args[0] == 'on' and argc < 4:
+            history.enable(int(args[1]) if argc > 1 else None, int(args[2]) * 1024 if argc > 2 else None)
+        elif args[0] == 'off' and argc == 1:
+            history.disable()
+        elif args[0] == 'clear' and argc == 1:
+            history.clear()
+        elif args[0] == 'changed' and argc < 3:
+            print(" ".join(history.changed(int(args[1]) if argc == 2 else None)))
+        elif args[0] in history.columns and argc < 3:
+            back = int(args[1]) if argc == 2 else 0
+            raw = history.get(args[0], back)
+            if raw is None:
+                print(f'register history: {args[0]} not recorded {back} stops ago')
+            else:
+                print(f'{args[0]} -{back}: {history.format(args[0], raw)}')
+        else:
+            print("register history [on [stops [KiB]]|off|clear|changed [stops]|register [stops]]")
+
+    def trace(self, args):
+        trace = regtrace.trace
+        argc = len(args)
+        if argc == 0:
+            print(f'register trace: {trace.summary()}')
+        elif args[0] == 'show' and argc < 4:
+            if not all(arg.isdigit() for arg in args[1:]):
+                print("register trace show [first [count]]")
+                return
+            first = int(args[1]) if argc > 1 else 0
+            count = int(args[2]) if argc > 2 else 20
+            for step in range(first, min(first + count, len(trace))):
+                changes = " ".join(f'{name}={trace.format(name, raw)}' for name, raw in trace.deltas(step))
+                print(f'{step:>6} {trace.pcs[step]:#x} {changes}')
+        elif args[0].isdigit() and argc == 1:
+            trace.run(int(args[0]), list(regsnap.snapshot.tracked))
+            print(f'register trace: {trace.summary()}')
+        elif args[0] == 'save' and argc in (2, 3):
+            if argc == 3 and not (args[2].isdigit() and int(args[2]) > 0):
+                print(f'register trace save: positive keyframe interval expected: {args[2]}')
+                return
+            try:
+                trace.save(args[1], int(args[2]) if argc == 3 else 256)
+            except IOError:
+                print(f'register trace: could not write to {args[1]}')
+        elif args[0] == 'file' and 1 < argc < 5:
+            if not all(arg.isdigit() for arg in args[2:]):
+                print("register trace file filename [first [count]]")
+                return
+            try:
+                reader = tracefile.TraceReader(args[1])
+            except (IOError, ValueError) as err:
+                print(f'register trace: {err}')
+                return
+            first = int(args[2]) if argc > 2 else 0
+            count = int(args[3]) if argc > 3 else 20
+            print(f'{args[1]}: {len(reader)} steps, {len(reader.names)} registers')
+            for step, pc, changed, values in reader.steps_from(first, count):
+                changes = " ".join(f'{reader.names[n]}=0x{values[n][::-1].hex()}' for n in changed)
+                print(f'{step:>6} {pc:#x} {changes}')
+            reader.close()
+        elif args[0] == 'block' and argc == 2 and args[1].isdigit():
+            trace.run(int(args[1]), list(regsnap.snapshot.tracked), blocks=True)
+            print(f'register trace: {trace.summary()}')
+        else:
+            print("register trace [[block] count|show [first [count]]|save filename [keyframe]|file filename [first [count]]]")
+
+    def index(self, args):
+        index = regindex.index
+        argc = len(args)
+        if argc == 0:
+            index.build_trace(regtrace.trace)
+            print(f'register index: {index.summary()}')
+            return
+        elif args[0] == 'file' and argc == 2:
+            try:
+                reader = tracefile.TraceReader(args[1])
+            except (IOError, ValueError) as err:
+                print(f'register index: {err}')
+                return
+            index.build_file(reader, args[1])
+            reader.close()
+            print(f'register index: {index.summary()}')
+            return
+
+        # the trace in memory has been rerun since it was indexed
+        if not index.source or index.source == "trace" and len(index) != len(regtrace.trace):
+            index.build_trace(regtrace.trace)
+        try:
+            if argc == 3 and args[1] in ('before', 'after', 'at') and args[2].isdigit():
+                step = int(args[2])
+                if args[1] == 'at':
+                    print(f'{args[0]} {"set" if index.at(args[0], step) else "clear"} after step {step}')
+                else:
+                    found = index.before(args[0], step) if args[1] == 'before' else index.after(args[0], step)
+                    print(f'{args[0]}: {"none" if found is None else found} {args[1]} step {step}')
+            elif argc == 1 and not "." in args[0]:
+                steps = index.lookup(args[0])
+                print(f'{args[0]}: {len(steps)} changes: {" ".join(str(step) for step in steps[:20])}')
+            else:
+                first = int(args.pop()) if args[-1].isdigit() else 0
+                if first == 0 and len(args) == 1:
+                    steps = index.lookup(args[0])
+                    print(f'{args[0]}: gained {len(steps)} times: {" ".join(str(step) for step in steps[:20])}')
+                total, steps = index.where(args, first, 20)
+                print(f'{" ".join(args)}: set for {total} steps: {" ".join(str(step) for step in steps)}')
+        except KeyError as err:
+            print(f'register index: {err.args[0]}')
+
+    def browse(self, args):
+        argc = len(args)
+        view = regsnap.snapshot.view
+        try:
+            if argc == 0:
+                print(f'register browse: {view.title() if view else "off"}')
+            elif args[0] == 'history' and argc == 1:
+                regtime.show(regtime.HistoryView(reghist.history))
+            elif args[0] == 'trace' and argc == 1:
+                regtime.show(regtime.TraceView(regtrace.trace))
+            elif args[0] == 'file' and argc == 2:
+                regtime.show(regtime.FileView(args[1]))
+            elif args[0] == 'off' and argc == 1:
+                regtime.show(None)
+            elif argc == 1 and args[0].lstrip('+-').isdigit():
+                if view is None:
+                    print("register browse: no history, trace or file being browsed")
+                elif args[0][0] in '+-':
+                    regtime.scroll(int(args[0]))
+                else:
+                    regtime.show(view, int(args[0]))
+            else:
+                print("register browse [history|trace|file filename|step|+N|-N|off]")
+        except (IOError, ValueError) as err:
+            print(f'register browse: {err}')
+
+    def bisect(self, args):
+        if len(args) < 2 or not (args[0].isdigit() and int(args[0]) > 0):
+            print("register bisect count predicate")
+            return
+
+        try:
+            predicate = regpred.Predicate(" ".join(args[1:]), regindex.index.decoders)
+            bisect = regbisect.Bisect(predicate)
+            step = bisect.run(int(args[0]))
+            if step is None:
+                print(f'register bisect: {predicate} still false after {args[0]} instructions, {bisect.summary()}')
+                return
+            values = ", ".join(f'{name} = {value}' for name, value in predicate.values().items())
+            pc = int.from_bytes(regsnap.snapshot.read_raw("pc"), 'little')
+            print(f'register bisect: {predicate} first true after {step} instructions at {pc:#x}: {values}')
+            print(f'register bisect: {bisect.summary()}')
+        except SyntaxError as err:
+            print(f'register bisect: {err}')
+        except (gdb.error, gdb.GdbError, ValueError) as err:
+            print(f'register bisect: {err}')
+        except Exception as err:
+            print(f'register bisect: {" ".join(args[1:])}: {type(err).__name__}: {err}')
+
+    def breakpoint(self, args):
+        if len(args) == 0:
+            for bp in regbreak.live():
+                if isinstance(bp, regbreak.RegisterBreakpoint):
+                    print(f'register break: {bp.summary()}')
+            return
+        elif len(args) < 2:
+            print("register break location predicate")
+            return
+
+        try:
+            predicate = regpred.Predicate(" ".join(args[1:]), regindex.index.decoders)
+            regbreak.breakpoints.append(regbreak.RegisterBreakpoint(args[0], predicate))
+        except SyntaxError as err:
+            print(f'register break: {err}')
+        except gdb.error as err:
+            print(f'register break: {args[0]}: {err}')
+
+    def histogram(self, args):
+        histograms = [bp for bp in regbreak.live() if isinstance(bp, regbreak.HistogramBreakpoint)]
+        argc = len(args)
+        if argc == 0 or argc == 1 and args[0].isdigit():
+            for bp in histograms:
+                print(bp.report(int(args[0]) if argc else 10))
+        elif argc == 1 and args[0] == 'clear':
+            for bp in histograms:
+                bp.delete()
+            regbreak.live()
+        elif argc > 1:
+            try:
+                regbreak.breakpoints.append(regbreak.HistogramBreakpoint(args[0], args[1:], regindex.index.decoders))
+            except SyntaxError as err:
+                print(f'register histogram: {err}')
+            except gdb.error as err:
+                print(f'register histogram: {args[0]}: {err}')
+        else:
+            print("register histogram [location register-spec...|count|clear]")
+
+    def log(self, args):
+        argc = len(args)
+        log = tracelog.log
+        if argc == 0:
+            print(f'register log: {log.status() if log else "not started"}')
+            print(f'register log: sync {self.log_sync}, full {self.log_full}')
+        elif args[0] == 'start' and argc in (2, 3):
+            if argc == 3 and not (args[2].isdigit() and int(args[2]) <= 9):
+                print(f'register log start: compression level 0-9 expected: {args[2]}')
+                return
+            if log:
+                log.close()
+            tracelog.log = tracelog.TraceLog(args[1], list(regsnap.snapshot.tracked), int(args[2]) if argc == 3 else 0,
+                                             self.log_sync, self.log_full)
+        elif args[0] == 'sync' and argc == 2:
+            if args[1] in ('never', 'close'):
+                self.log_sync = args[1]
+            else:
+                try:
+                    self.log_sync = float(args[1])
+                except ValueError:
+                    print(f'register log sync: never, close or seconds expected: {args[1]}')
+                    return
+            if log:
+                log.sync = self.log_sync
+        elif args[0] == 'full' and argc == 2 and args[1] in ('block', 'drop'):
+            self.log_full = args[1]
+            if log:
+                log.full = self.log_full
+        elif args[0] == 'flush' and argc == 1:
+            if log:
+                log.flush()
+                print(f'register log: {log.status()}')
+        elif args[0] == 'stop' and argc == 1:
+            if log:
+                log.close()
+                print(f'register log: {log.status()}')
+        else:
+            print("register log [start filename [level]|sync never|close|seconds|full block|drop|flush|stop]")
+
+class RegisterSubCmd(gdb.Command):
+    """A register subcommand, its arguments are passed to a RegisterCmd method."""
+
+    def __init__(self, name, method):
+        super(RegisterSubCmd, self).__init__(f'register {name}', gdb.COMMAND_DATA)
+        self.method = method
+
+    def invoke(self, arguments, from_tty):
+        self.method(gdb.string_to_argv(arguments))
+
+class RegisterCacheCmd(RegisterSubCmd):
+    """Show the hits and misses of the register text cache.
+register cache [size] - and set its size"""
+
+class RegisterRefreshCmd(RegisterSubCmd):
+    """Draw the windows at most once every ms after a stop.
+register refresh [ms|off] - the stops in between are skipped (default 20), or off to draw at every prompt.
+    refresh alone shows how many stops were skipped"""
+
+class RegisterBudgetCmd(RegisterSubCmd):
+    """Stop formatting rows after ms per draw.
+register budget [ms|off] - the rows left are shown greyed and finished in later slices, changed registers
+    and the rows in view first. budget alone shows the slices used"""
+
+class RegisterProfileCmd(RegisterSubCmd):
+    """Time each phase of the window refreshes.
+register profile on [stops]|off|clear - over the last stops (default 100)
+register profile - show the time per stop of each phase and the most costly registers"""
+
+class RegisterHistoryCmd(RegisterSubCmd):
+    """Keep the window's registers for the last stops.
+register history on [stops [KiB]]|off|clear - (default 1000, 16384 KiB)
+register history - show how many stops are kept and the memory used
+register history changed [stops] - list the registers which changed in the last stops
+register history register [stops] - show the register's value that many stops ago"""
+
+class RegisterTraceCmd(RegisterSubCmd):
+    """Stepi recording the registers which change.
+register trace count - stepi count instructions, redraw at the end
+register trace block count - the same running a basic block at a time to a breakpoint on its branch
+register trace show [first [count]] - list the steps of the trace with the registers each one changed
+register trace save filename [keyframe] - write the trace to a file, a full keyframe every 256 steps by default
+register trace file filename [first [count]] - list the steps of a trace file"""
+
+class RegisterIndexCmd(RegisterSubCmd):
+    """Index where each register and flag changes in the trace or a trace file.
+register index [file filename] - build the index
+register index register [before|after step] - steps which changed the register, or the last before or first after step
+register index register.FLAG [before|after step] - the same for the steps where a cpsr, fpsr or fpscr flag became set
+register index register.FLAG at step - whether the flag is set after step
+register index register.FLAG... [first] - steps from first where all the flags are set"""
+
+class RegisterBrowseCmd(RegisterSubCmd):
+    """Show the windows at a recorded step.
+register browse history|trace|file filename - go to the last recorded step, hscroll or browse +N|-N move
+    through the steps, changes are against the step before
+register browse step|+N|-N|off - go to a step, move N steps or go back to the target"""
+
+class RegisterBisectCmd(RegisterSubCmd):
+    """Find the first instruction after which a predicate is true.
+register bisect count predicate - of the next count instructions, by running to the middle from fork
+    checkpoints. predicate is a Python expression over registers, lanes and flags:
+    x0 == 5, v1.s.f[2] > 0.5, isnan(v0.d.f), fpsr.DZC"""
+
+class RegisterBreakCmd(RegisterSubCmd):
+    """Stop when a register predicate is true.
+register break location predicate - a breakpoint evaluated in Python from the raw register bytes rather
+    than by gdb's expression evaluator
+register break - list the register breakpoints with their hits, stops and time spent in the condition"""
+
+class RegisterHistogramCmd(RegisterSubCmd):
+    """Count the values of registers each time a location is hit.
+register histogram location register-spec... - registers or lanes (x0, w3.s, v1.s.f[2]), without stopping.
+    Exact for up to 256 values, then the top 16 and a count-min sketch
+register histogram [count] - show the most common count values of each histogram (default 10)
+register histogram clear - delete the histogram breakpoints"""
+
+class RegisterReplayCmd(RegisterSubCmd):
+    """Keep registers per instruction while replaying a recording.
+register replay [size|clear] - the number of instructions kept"""
+
+class RegisterTableCmd(RegisterSubCmd):
+    """Show the target's registers as gdb lists them.
+register table [group] - read by descriptor, and where the table came from, or the registers in group
+    (general, float, vector, system, all...)"""
+
+class RegisterLogCmd(RegisterSubCmd):
+    """Write the registers at every stop to a trace file from a background thread.
+register log start filename [level] - gzip compressed if level is 1-9
+register log sync never|close|seconds - when the log file is synced to disk (default close)
+register log full block|drop - wait for the disk or drop stops when the log queue is full (default block)
+register log flush - wait until everything queued has been written
+register log stop - write what is queued and close the file
+register log - show how much has been written, queued and dropped"""
+
 regWinCmd = RegisterCmd()
+RegisterCacheCmd("cache", regWinCmd.cache)
+RegisterRefreshCmd("refresh", regWinCmd.refresh)
+RegisterBudgetCmd("budget", regWinCmd.budget)
+RegisterProfileCmd("profile", regWinCmd.profile)
+RegisterHistoryCmd("history", regWinCmd.history)
+RegisterTraceCmd("trace", regWinCmd.trace)
+RegisterIndexCmd("index", regWinCmd.index)
+RegisterBrowseCmd("browse", regWinCmd.browse)
+RegisterBisectCmd("bisect", regWinCmd.bisect)
+RegisterBreakCmd("break", regWinCmd.breakpoint)
+RegisterHistogramCmd("histogram", regWinCmd.histogram)
+RegisterReplayCmd("replay", regWinCmd.replay)
+RegisterTableCmd("table", regWinCmd.table)
+RegisterLogCmd("log", regWinCmd.log)
 
 def RegisterFactory(tui):
     win = RegisterWindow(tui)
-    gdb.events.before_prompt.connect(win.create_register)
+    regsnap.snapshot.subscribe(win.create_register)
     regWinCmd.set_win(win)
     return win
 
-class RegisterWindow(object):
+class RegisterWindow(tuiscreen.Rows):
 
     regs_save = {}
 
     def __init__(self, tui):
+        super(RegisterWindow, self).__init__()
         self.tui = tui
         tui.title = "Registers"
         self.regs = RegisterWindow.regs_save
         self.start = 0
         self.tui_list = []
+        self.screen = tuiscreen.Screen(tui)
+        self.rows = None
+        self.generation = None
+        self.width = None
+        regsnap.snapshot.track(self.regs)
 
     def add_registers(self, list):
         for name in list:
             if not name in self.regs:
                 try:
                     self.regs[name] = Register.Factory(name)
+                    regsnap.snapshot.track([name])
+                    self.rows = None
+                    self.generation = None
                 except:
                     print(f'register: invalid register {name}.')
             
@@ -460,6 +981,9 @@ class RegisterWindow(object):
         for name in list:
             try:
                 del self.regs[name]
+                regsnap.snapshot.untrack([name])
+                self.rows = None
+                self.generation = None
             except:
                print(f'register del {name} not found')
 
@@ -470,8 +994,13 @@ class RegisterWindow(object):
 
             self.regs[name].fmt = format
 
+        self.generation = None
+
     def clear_registers(self):
+        regsnap.snapshot.untrack(self.regs)
         self.regs.clear()
+        self.rows = None
+        self.generation = None
 
     def save_registers(self, filename):
         try:
@@ -484,53 +1013,101 @@ class RegisterWindow(object):
 
     def close(self):
         RegisterWindow.regs_save = self.regs
-        gdb.events.before_prompt.disconnect(self.create_register)
+        regsnap.snapshot.unsubscribe(self.create_register)
+        regsnap.snapshot.untrack(self.regs)
 
     def render(self):
         if not self.tui.is_valid():
             return
 
-        self.tui.erase()
+        # only the rows which fit in the window are formatted, each is followed by a blank line
+        self.draw_rows(range(self.start, min(len(self.tui_list), self.start + self.tui.height // 2 + 1)))
 
-        for l in self.tui_list[self.start:]:
-            self.tui.write(l)
+    def lines(self):
+        return self.tui_list
 
-    def create_register(self):
-        self.tui_list = []
+    def build(self, i):
+        return self.create_row(self.rows[i])
+
+    def changed(self, i):
+        snapshot = regsnap.snapshot
+        return any(snapshot.changed(name, reg.raw, snapshot.read_raw(name)) for name, reg in self.rows[i])
 
+    def blank(self, i):
+        return "".join(f'{name:<29}' for name, reg in self.rows[i]) + NL
+
+    def layout(self):
+        """split the registers into rows which fit the width of the window"""
+        self.rows = []
+        width = self.tui.width
+        row = []
+
+        for name, reg in self.regs.items():
+            if width < 53 and reg.is_vector() or width < 29 and not reg.is_vector():
+                self.rows.append(row)
+                row = []
+                width = self.tui.width
+
+            row.append((name, reg))
+            width -= 53 if reg.is_vector() else 29
+
+        if row:
+            self.rows.append(row)
+
+    def create_row(self, row):
+        line = ""
+
+        for name, reg in row:
+            reg.value()
+            line += f'{GREEN}{name:<5}{reg:<24}{RESET}'
+
+        return line + NL
+
+    def create_register(self):
         if not self.tui.is_valid():
+            self.tui_list = []
             return
-        
+
+        view = regsnap.snapshot.view
+        title = f'Registers {view.title()}' if view else "Registers"
+        if self.tui.title != title:
+            self.tui.title = title
+
+        # nothing has moved since the lines were built, just redraw them
+        if self.generation == regsnap.snapshot.generation and self.width == self.tui.width:
+            self.render()
+            return
+
+        drawn = self.tui_list
+        self.tui_list = []
+        self.generation = regsnap.snapshot.generation
+
         try:
-            Register.frame = gdb.selected_frame()
+            # a trace file or the history is drawn from what it recorded, with or without a program
+            if view is None:
+                regsnap.snapshot.selected_frame()
         except gdb.error:
             self.start = 0
             self.title = "No Frame"
             self.tui_list.append("No frame currently selected" + NL)
+            self.keep([], 1)
             self.render()
             return
-        
-        width = self.tui.width
-        line = ""
-
-        for name, reg in self.regs.items():
-            reg.value()
 
-            if width < 53 and reg.is_vector() or width < 29 and not reg.is_vector():
-                line += NL
-                self.tui_list.append(line)
-                line = ""
-                width = self.tui.width
-
-            line += f'{GREEN}{name:<5}{reg:<24}{RESET}'
-            width -= 53 if reg.is_vector() else 29
-
-        if line != "":
-            line += NL
-            self.tui_list.append(line)
+        if self.rows is None or self.width != self.tui.width:
+            self.width = self.tui.width
+            self.layout()
+            drawn = []
+        self.keep(drawn, len(self.rows))
 
+        # rows are formatted by render when they scroll into view
+        self.tui_list = [None] * len(self.rows)
         self.render()
 
+    def hscroll(self, num):
+        # move through the recorded steps being browsed
+        regtime.scroll(num)
+
     def vscroll(self, num):
         if num > 0 and num + self.start < len(self.tui_list) or \
            num < 0 and num + self.start >= 0:
@@ -538,3 +1115,9 @@ class RegisterWindow(object):
             self.render()
 
 gdb.register_window_type("register", RegisterFactory)
+
+regprof.profiler.instrument(RegisterWindow, "create_row", "line building")
+regprof.profiler.instrument(tuiscreen.Screen, "draw", "tui.write")
+regprof.profiler.instrument(Register, "__str__", "format cache", lambda args: args[0].name)
+for reg in [Register] + Register.__subclasses__():
+    regprof.profiler.instrument(reg, "to_string", "format_string", lambda args: args[0].name)
@@ -1,4 +1,9 @@
-from platform import machine
+from os.path import abspath, dirname, join
+gdb.execute(f'source {join(dirname(abspath(__file__)), "regpath.py")}')
+
+import regfmt
+import regsnap
+import regtable
 
 GREEN = "\x1b[38;5;47m"
 WHITE = "\x1b[38;5;15m"
@@ -39,6 +44,7 @@ q_list = {"q0": 0, "q1": 1, "q2": 2, "q3": 3, "q4": 4, "q5": 5, "q6": 6, "q7": 7
 class InfoGSD(gdb.Command):
 
     def invoke(self, arguments, from_tty):
+        regsnap.snapshot.live()
         argv = gdb.string_to_argv(arguments)
         
         list = []
@@ -79,9 +85,9 @@ class InfoGSD(gdb.Command):
                    prev = name
                    list.append(name)
 
-        frame = gdb.selected_frame()
+        regsnap.snapshot.check()
         for name in list:
-            val = frame.read_register(name)
+            val = regsnap.snapshot.read(name)
             print(f'{GREEN}{name:<10}{RESET}{self.format_reg(val):<24}')
 
     def format_reg(self, val):
@@ -144,8 +150,6 @@ info single s0 s4 - s9"""
     def format_reg(self, val):
         return val['u'].format_string(format='z') if self.hex else val[self.type].format_string()
 
-type_ptr_double = gdb.Value(0.0).type.pointer()
-
 class InfoSingle32(InfoGSD):
     """Display the single precision floating point registers and values for a given range.
 info single [/x] [register-list] (s0 - s31)
@@ -160,7 +164,7 @@ info single s0 s4 - s9"""
        super().__init__("info single", gdb.COMMAND_DATA)
 
     def format_reg(self, val):
-        return val.cast(type_ptr_double).format_string(format="z") if self.hex else val.format_string()
+        return val.cast(regfmt.double_pointer()).format_string(format="z") if self.hex else val.format_string()
 
 #---- double ----- 
 
@@ -311,7 +315,7 @@ info vector /u32 q0 q2 - q4"""
         return val[hex].format_string(format='z', repeat_threshold=0) if self.hex \
                else val[self.width].format_string(repeat_threshold=0)
 
-if machine() == "aarch64":
+if regtable.architecture().startswith("aarch64"):
     InfoGeneral64()
     InfoSingle64()
     InfoDouble64()
@@ -0,0 +1,163 @@
+# Find the first instruction after which a register predicate is true.
+#
+# Stepping and testing every instruction costs a stop per instruction. Instead a
+# fork checkpoint (gdb's checkpoint and restart, Linux native only) is taken where
+# the predicate is false, the program is run count instructions with one stepi
+# count and the predicate tested once. The range is then halved: restart from the
+# last checkpoint known false, run to the middle and test. When the middle is still
+# false a new checkpoint is taken there, so each run starts from the latest false
+# point and the instructions run in total are about twice count, with log2(count)
+# tests. Like any bisection it needs a predicate which stays true once it is true,
+# such as the cumulative fpsr flags, or a register equal to a value it only passes
+# once. It also has to depend only on the instructions executed: a program reading
+# the clock or racing threads can give a different answer on each run.
+#
+# Each stepi count has to run all count instructions: a breakpoint, a signal or the
+# program exiting part way stops it sooner and every step after would be counted
+# from the wrong place. The stop event is checked after each run, and the pc at
+# each instruction count reached is kept and compared when a run starts from or
+# reaches it again, which catches a program that runs differently from the same
+# checkpoint. Either ends the bisect with a gdb.GdbError.
+#
+# The inferior is left stopped after the first instruction where the predicate is
+# true and the checkpoints taken are deleted. The process the bisect started in has
+# run on to the end of the range and stays as checkpoint 0. After an error the
+# inferior is restarted where the bisect started instead, or if that fails the
+# checkpoint holding it is kept and its id given in the error.
+#
+# bisect = regbisect.Bisect(regpred.Predicate("fpsr.DZC", decoders))
+# step = bisect.run(100000)      # None if still false after 100000 instructions
+
+import gdb
+import re
+
+import regsnap
+
+CHECKPOINT = re.compile(r"checkpoint (\d+)", re.IGNORECASE)
+
+class Bisect(object):
+
+    def __init__(self, predicate):
+        self.predicate = predicate
+        self.checkpoints = []    # ids taken by this bisect, to delete at the end
+        self.start = None        # id of the checkpoint holding the state the bisect started in
+        self.pcs = {}            # instructions run -> pc there
+        self.restarts = 0
+        self.stepped = 0
+        self.tests = 0
+
+    def checkpoint(self):
+        text = gdb.execute("checkpoint", from_tty=True, to_string=True)
+        match = CHECKPOINT.search(text)
+        if match is None:
+            raise gdb.error(f"checkpoint failed: {text.strip()}")
+        self.checkpoints.append(int(match.group(1)))
+        return self.checkpoints[-1]
+
+    def restart(self, checkpoint):
+        """go back to checkpoint and keep a copy of it, as running a checkpoint uses it up"""
+        gdb.execute(f"restart {checkpoint}", to_string=True)
+        self.restarts += 1
+        copy = self.checkpoint()
+        if checkpoint == self.start:
+            self.start = copy
+        return copy
+
+    def step(self, count, here):
+        """run count instructions from here, raises gdb.GdbError if they did not all run"""
+        if count <= 0:
+            return
+
+        self.at(here)
+        stops = []
+        gdb.events.stop.connect(stops.append)
+        try:
+            gdb.execute(f"stepi {count}", to_string=True)
+        finally:
+            gdb.events.stop.disconnect(stops.append)
+        self.stepped += count
+
+        if gdb.selected_thread() is None:
+            raise gdb.GdbError(f"the program exited within {count} instructions of step {here}")
+        stop = stops[-1] if stops else None
+        if isinstance(stop, gdb.BreakpointEvent):
+            numbers = ", ".join(str(bp.number) for bp in stop.breakpoints)
+            raise gdb.GdbError(f"stepi {count} from step {here} stopped at breakpoint {numbers}, disable it to bisect")
+        if isinstance(stop, gdb.SignalEvent):
+            raise gdb.GdbError(f"stepi {count} from step {here} stopped by {stop.stop_signal}")
+
+        self.at(here + count)
+
+    def at(self, here):
+        """note the pc after here instructions, raises gdb.GdbError if an earlier run had another there"""
+        pc = gdb.selected_frame().pc()
+        if self.pcs.setdefault(here, pc) != pc:
+            raise gdb.GdbError(f"step {here} was at {self.pcs[here]:#x} and is now at {pc:#x}, "
+                               "the program does not run the same way from a checkpoint")
+
+    def test(self):
+        """the predicate now, raises gdb.GdbError for anything it raises, x1 / x0 with x0 zero"""
+        regsnap.snapshot.invalidate()
+        self.tests += 1
+        try:
+            return self.predicate()
+        except gdb.error:
+            raise
+        except Exception as err:
+            raise gdb.GdbError(f"{self.predicate}: {type(err).__name__}: {err}")
+
+    def run(self, count):
+        """the number of instructions after which the predicate is first true, None if not within count"""
+        if self.test():
+            return 0
+
+        low, high = 0, count
+        saved = self.start = self.checkpoint()    # at low, where the predicate is false
+        try:
+            self.step(count, 0)
+            if not self.test():
+                return None
+
+            here = count
+            while high - low > 1:
+                middle = (low + high) // 2
+                saved = self.restart(saved)
+                self.step(middle - low, low)
+                here = middle
+                if self.test():
+                    high = middle
+                else:
+                    low = middle
+                    saved = self.checkpoint()
+
+            if here != high:
+                saved = self.restart(saved)
+                self.step(high - low, low)
+                self.test()
+            return high
+        except (Exception, KeyboardInterrupt) as err:
+            # whatever stopped it, the user's starting state is not deleted with the rest
+            self.back(err)
+        finally:
+            self.delete()
+
+    def back(self, err):
+        """after err go back to where the bisect started, or keep the checkpoint holding it"""
+        try:
+            gdb.execute(f"restart {self.start}", to_string=True)
+            regsnap.snapshot.invalidate()
+        except gdb.error:
+            self.checkpoints.remove(self.start)
+            raise gdb.GdbError(f"{err}, the state it started in is checkpoint {self.start}")
+        raise gdb.GdbError(f"{err}, restarted where it began")
+
+    def delete(self):
+        for checkpoint in self.checkpoints:
+            try:
+                gdb.execute(f"delete checkpoint {checkpoint}", to_string=True)
+            except gdb.error:
+                pass    # the one running now
+        self.checkpoints = []
+
+    def summary(self):
+        return f'{self.tests} tests, {self.restarts} restarts, {self.stepped} instructions run'
@@ -0,0 +1,99 @@
+# Breakpoints whose condition is a register predicate evaluated in Python.
+#
+# break *addr if $x0 == 5 has gdb parse and evaluate the condition through its
+# expression evaluator at every hit, reading each register as a value. Here the
+# condition is a regpred predicate, compiled once, and stop() only unpacks the raw
+# bytes of the registers it names through the snapshot, which cuts w3 or s2 out of
+# the x3 or v2 it has already read. On a tight loop that is most of the cost of a
+# hit which does not stop.
+#
+# bp = regbreak.RegisterBreakpoint("*0x400abc", regpred.Predicate("v1.s.f[2] > 0.5"))
+# bp.hits, bp.stops
+#
+# A HistogramBreakpoint never stops: each hit adds the values of its register specs
+# to regvalues histograms and the inferior carries on.
+#
+# bp = regbreak.HistogramBreakpoint("*0x400abc", ["x0", "v1.s.f[2]"], decoders)
+
+import gdb
+from time import perf_counter
+
+import regpred
+import regsnap
+import regvalues
+
+class RegisterBreakpoint(gdb.Breakpoint):
+
+    def __init__(self, spec, predicate, temporary=False):
+        super().__init__(spec, temporary=temporary)
+        self.predicate = predicate
+        self.hits = 0
+        self.stops = 0
+        self.seconds = 0.0
+
+    def stop(self):
+        self.hits += 1
+        start = perf_counter()
+        # the inferior has run since the last stop, gdb sends no event before stop()
+        regsnap.snapshot.invalidate()
+        try:
+            stop = self.predicate()
+        except (gdb.error, ValueError, TypeError, ArithmeticError) as err:
+            print(f'register break: {self.location}: {self.predicate}: {err}')
+            stop = True
+        self.seconds += perf_counter() - start
+        self.stops += stop
+        return stop
+
+    def summary(self):
+        rate = self.hits / self.seconds if self.seconds else 0
+        return f'{self.location} if {self.predicate}: {self.hits} hits, {self.stops} stops, ' \
+               f'{self.seconds * 1000:.1f} ms in conditions ({rate:.0f} hits/s)'
+
+class HistogramBreakpoint(gdb.Breakpoint):
+
+    def __init__(self, spec, specs, decoders=None):
+        # parse before the breakpoint exists so a bad spec leaves nothing behind
+        refs = [regpred.parse(text, decoders) for text in specs]
+        super().__init__(spec)
+        self.specs = list(specs)
+        self.refs = refs
+        self.histograms = [regvalues.Histogram() for text in specs]
+        self.hits = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    def stop(self):
+        self.hits += 1
+        start = perf_counter()
+        regsnap.snapshot.invalidate()
+        read = regsnap.snapshot.read_raw
+        try:
+            for ref, histogram in zip(self.refs, self.histograms):
+                histogram.add(ref.value(read(ref.name)))
+        except (gdb.error, ValueError):
+            # counted rather than printed, a hot loop would flood the console
+            self.errors += 1
+        self.seconds += perf_counter() - start
+        return False
+
+    def summary(self):
+        rate = self.hits / self.seconds if self.seconds else 0
+        errors = f', {self.errors} unreadable' if self.errors else ""
+        return f'{self.location}: {self.hits} hits{errors}, {self.seconds * 1000:.1f} ms counting ({rate:.0f} hits/s)'
+
+    def report(self, count=10):
+        lines = [self.summary()]
+        for text, histogram in zip(self.specs, self.histograms):
+            lines.append(f'  {text}: {histogram.summary()}')
+            for value, hits in histogram.top(count):
+                share = hits / histogram.total * 100 if histogram.total else 0
+                lines.append(f'    {hits:>12} {share:5.1f}%  {regvalues.format_value(value)}')
+        return "\n".join(lines)
+
+breakpoints = []
+
+def live():
+    """the register breakpoints not deleted by the user"""
+    breakpoints[:] = [bp for bp in breakpoints if bp.is_valid()]
+    return breakpoints
@@ -0,0 +1,242 @@
+# Format register values from their raw bytes.
+#
+# The layout of a register type (unions of arrays of lanes for the vector registers)
+# is walked once with the gdb.Type API and turned into a Python function which
+# unpacks the raw bytes with struct and builds the same text gdb.Value.format_string
+# would. After that a register costs no gdb.Value subscripts or formatter calls.
+#
+# Only the default format and 'z' are handled, with the user's print repeats and
+# print elements settings. Anything else returns None and the caller should fall
+# back to format_string.
+#
+# options = regfmt.print_options()
+# st = regfmt.format_raw(val.type, raw, ('s', 'f'), None, *options)
+#
+# format_cache keeps the text of register values already formatted, keyed by
+# (register class, raw bytes, fmt), so a value seen before is not formatted again.
+
+import gdb
+import struct
+from collections import OrderedDict
+
+#--------------------------
+# floating point formats: size -> (exponent bits, mantissa bits, %g precision)
+
+IEEE_FLOAT = {2: (5, 10, 5), 4: (8, 23, 9), 8: (11, 52, 17)}
+BFLOAT16 = (8, 7, 4)
+
+INT_CODE = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+FLOAT_CODE = {2: 'e', 4: 'f', 8: 'd'}
+
+def print_options():
+    """(repeats, elements) from the user's print settings, None if the formatters can't follow them"""
+    if gdb.parameter("print pretty") or not gdb.parameter("print union"):
+        return None
+
+    return (gdb.parameter("print repeats") or 0, gdb.parameter("print elements") or 0)
+
+# used to print floats in hex by casting the value to a pointer. We could use any pointer type really.
+pointer = None
+
+def double_pointer():
+    """a pointer type to cast a float to for its bits in hex, looked up on first use rather than at source time"""
+    global pointer
+    if pointer is None:
+        pointer = gdb.Value(0.0).type.pointer()
+    return pointer
+
+def is_signed(type):
+    try:
+        return type.is_signed    # gdb 12
+    except AttributeError:
+        name = type.name or ""
+        return not (name.startswith('u') or name.startswith("unsigned"))
+
+def special_float(bits, size, exp_len, man_len):
+    """gdb's text for nan and inf, None for a number"""
+    if (bits >> man_len) & ((1 << exp_len) - 1) != (1 << exp_len) - 1:
+        return None
+
+    sign = "-" if bits >> (size * 8 - 1) else ""
+    mantissa = bits & ((1 << man_len) - 1)
+    if mantissa == 0:
+        return sign + "inf"
+
+    # gdb prints the mantissa as a short first word then 32 bit words
+    first = man_len % 32 or 32
+    st = f'{mantissa >> (man_len - first):x}'
+    for shift in range(man_len - first - 32, -1, -32):
+        st += f'{(mantissa >> shift) & 0xffffffff:08x}'
+
+    return f'{sign}nan(0x{st})'
+
+#--------------------------
+# lane unpackers: (type, count) -> function(raw, offset) -> list of str
+
+def int_lanes(type, count, format):
+    size = type.sizeof
+    if format == 'z':
+        def lanes(raw, offset):
+            return ['0x' + raw[i:i + size][::-1].hex() for i in range(offset, offset + count * size, size)]
+        return lanes
+
+    signed = is_signed(type)
+    if size in INT_CODE:
+        code = INT_CODE[size].lower() if signed else INT_CODE[size]
+        unpack = struct.Struct(f'<{count}{code}').unpack_from
+        def lanes(raw, offset):
+            return [str(v) for v in unpack(raw, offset)]
+        return lanes
+
+    def lanes(raw, offset):
+        return [str(int.from_bytes(raw[i:i + size], 'little', signed=signed))
+                for i in range(offset, offset + count * size, size)]
+    return lanes
+
+def float_lanes(type, count, format):
+    size = type.sizeof
+    if format == 'z':
+        return int_lanes(type, count, format)
+
+    if size == 2 and "bfloat16" in (type.name or ""):
+        exp_len, man_len, digits = BFLOAT16
+        to_float = lambda bits: struct.unpack('<f', struct.pack('<I', bits << 16))[0]
+    elif size in IEEE_FLOAT:
+        exp_len, man_len, digits = IEEE_FLOAT[size]
+        to_float = None
+    else:
+        raise TypeError(f"float of size {size}")
+
+    unpack_bits = struct.Struct(f'<{count}{INT_CODE[size]}').unpack_from
+    unpack_float = struct.Struct(f'<{count}{FLOAT_CODE[size]}').unpack_from
+
+    def lanes(raw, offset):
+        bits = unpack_bits(raw, offset)
+        values = [to_float(b) for b in bits] if to_float else unpack_float(raw, offset)
+        out = []
+        for b, v in zip(bits, values):
+            st = special_float(b, size, exp_len, man_len)
+            out.append(st if st is not None else '%.*g' % (digits, v))
+        return out
+    return lanes
+
+def scalar_lanes(type, count, format):
+    if type.code == gdb.TYPE_CODE_INT:
+        return int_lanes(type, count, format)
+    elif type.code == gdb.TYPE_CODE_FLT:
+        return float_lanes(type, count, format)
+
+    raise TypeError(f"can not format {type}")
+
+#--------------------------
+# compile a type into function(raw, offset) -> str
+
+def join_elements(items, repeats, elements):
+    """gdb's array element list with <repeats n times> and the print elements limit"""
+    out = []
+    count = len(items)
+    printed = 0
+    i = 0
+    while i < count and (not elements or printed < elements):
+        reps = 1
+        if repeats:
+            while i + reps < count and items[i + reps] == items[i]:
+                reps += 1
+
+        if repeats and reps > repeats:
+            out.append(f'{items[i]} <repeats {reps} times>')
+            printed += repeats
+        else:
+            out.append(items[i])
+            reps = 1
+            printed += 1
+        i += reps
+
+    return "{" + ", ".join(out) + ("..." if i < count else "") + "}"
+
+def compile(type, format, repeats, elements):
+    type = type.strip_typedefs()
+
+    if type.code in (gdb.TYPE_CODE_UNION, gdb.TYPE_CODE_STRUCT):
+        fields = [(field.name, field.bitpos // 8, compile(field.type, format, repeats, elements))
+                  for field in type.fields()]
+        def fmt(raw, offset):
+            return "{" + ", ".join(f'{name} = {f(raw, offset + pos)}' for name, pos, f in fields) + "}"
+        return fmt
+
+    if type.code == gdb.TYPE_CODE_ARRAY:
+        low, high = type.range()
+        lanes = scalar_lanes(type.target().strip_typedefs(), high - low + 1, format)
+        def fmt(raw, offset):
+            return join_elements(lanes(raw, offset), repeats, elements)
+        return fmt
+
+    lanes = scalar_lanes(type, 1, format)
+    def fmt(raw, offset):
+        return lanes(raw, offset)[0]
+    return fmt
+
+formatters = {}
+
+def field_type(type, name):
+    for field in type.strip_typedefs().fields():
+        if field.name == name:
+            return field.type
+    raise TypeError(f"no field {name} in {type}")
+
+def format_raw(type, raw, path=(), format=None, repeats=0, elements=0):
+    """the text of the register (type, raw) or of the field named by path, None if not supported"""
+    key = (type.name or str(type), path, format, repeats, elements)
+    try:
+        fmt = formatters[key]
+    except KeyError:
+        try:
+            if not format in (None, 'z'):
+                raise TypeError(f"format {format}")
+            for name in path:
+                type = field_type(type, name)
+            fmt = compile(type, format, repeats, elements)
+        except TypeError:
+            fmt = None
+        formatters[key] = fmt
+
+    return fmt(raw, 0) if fmt else None
+
+#--------------------------
+# text of values already formatted
+
+class FormatCache(object):
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, to_string):
+        """the text for key, calling to_string() to make it if it is not cached"""
+        try:
+            text = self.cache[key]
+        except KeyError:
+            self.misses += 1
+            text = self.cache[key] = to_string()
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+            return text
+
+        self.hits += 1
+        self.cache.move_to_end(key)
+        return text
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        while len(self.cache) > maxsize:
+            self.cache.popitem(last=False)
+
+    def clear(self, event=None):
+        self.cache.clear()
+
+format_cache = FormatCache()
+
+# a new objfile can change the symbol printed for an address
+gdb.events.new_objfile.connect(format_cache.clear)
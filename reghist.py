@@ -0,0 +1,150 @@
+# History of the tracked registers over the last N stops.
+#
+# Each register has a column: one bytearray holding its raw bytes for every stop in
+# the ring, and a bytearray of flags saying which stops have a value (a register added
+# to a window part way through has none before that). Appending a stop writes each
+# column's slot in place, so it costs the same however long the history is, and no
+# gdb.Value is kept. The number of stops kept is cut down to stay under the memory
+# limit as registers are added.
+#
+# reghist.history.enable(1000, 16 << 20)
+# raw = reghist.history.get("x5", 3)          # x5 three stops ago
+# names = reghist.history.changed(50)         # registers which changed in the last 50 stops
+
+import gdb
+
+import regsnap
+
+class Column(object):
+
+    __slots__ = ("size", "data", "valid")
+
+    def __init__(self, size, capacity):
+        self.size = size
+        self.data = bytearray(size * capacity)
+        self.valid = bytearray(capacity)
+
+class History(object):
+
+    def __init__(self, stops=1000, limit=16 << 20):
+        self.enabled = False
+        self.stops = stops       # stops asked for
+        self.limit = limit       # bytes the columns may use
+        self.capacity = stops    # stops which fit under the limit
+        self.columns = {}        # name -> Column
+        self.types = {}          # name -> gdb.Type for formatting
+        self.count = 0           # stops appended since the last clear
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def memory(self):
+        return sum(len(column.data) + len(column.valid) for column in self.columns.values())
+
+    def enable(self, stops=None, limit=None):
+        self.stops = stops or self.stops
+        self.limit = limit or self.limit
+        self.resize()
+        if not self.enabled:
+            self.enabled = True
+            gdb.events.stop.connect(self.record)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            gdb.events.stop.disconnect(self.record)
+
+    def clear(self):
+        self.columns = {}
+        self.count = 0
+
+    def resize(self):
+        """fit the ring to the stops asked for and the memory limit, keeping the newest stops"""
+        per_stop = sum(column.size + 1 for column in self.columns.values()) or 1
+        capacity = max(1, min(self.stops, self.limit // per_stop))
+        if capacity == self.capacity:
+            return
+
+        kept = min(len(self), capacity)
+        for name, column in self.columns.items():
+            new = Column(column.size, capacity)
+            for back in range(kept):
+                old_slot = (self.count - 1 - back) % self.capacity
+                new_slot = (kept - 1 - back) % capacity
+                new.data[new_slot * column.size:(new_slot + 1) * column.size] = \
+                    column.data[old_slot * column.size:(old_slot + 1) * column.size]
+                new.valid[new_slot] = column.valid[old_slot]
+            self.columns[name] = new
+
+        self.capacity = capacity
+        self.count = kept
+
+    def append(self, values):
+        """add a stop, values is name -> raw bytes"""
+        grown = False
+        for name, raw in values.items():
+            if not name in self.columns:
+                self.columns[name] = Column(len(raw), self.capacity)
+                grown = True
+        if grown:
+            self.resize()
+
+        slot = self.count % self.capacity
+        for name, column in self.columns.items():
+            raw = values.get(name)
+            if raw is not None and len(raw) == column.size:
+                column.data[slot * column.size:(slot + 1) * column.size] = raw
+                column.valid[slot] = 1
+            else:
+                column.valid[slot] = 0
+
+        self.count += 1
+
+    def record(self, event=None):
+        values = {}
+        for name in list(regsnap.snapshot.tracked):
+            try:
+                values[name] = regsnap.snapshot.read_raw(name)
+                if not name in self.types:
+                    self.types[name] = regsnap.snapshot.read(name).type
+            except (gdb.error, ValueError):
+                pass
+
+        if values:
+            self.append(values)
+
+    def get(self, name, back=0):
+        """raw bytes of name back stops ago, None if not recorded"""
+        column = self.columns.get(name)
+        if column is None or back >= len(self):
+            return None
+
+        slot = (self.count - 1 - back) % self.capacity
+        if not column.valid[slot]:
+            return None
+        return bytes(column.data[slot * column.size:(slot + 1) * column.size])
+
+    def changed(self, last=None):
+        """names of the registers whose value changed in the last stops"""
+        last = min(last or len(self), len(self) - 1)
+        names = []
+        for name, column in self.columns.items():
+            size = column.size
+            slot = (self.count - 1) % self.capacity
+            for back in range(last):
+                prev = (slot - 1) % self.capacity
+                if column.valid[slot] and column.valid[prev] and \
+                   column.data[slot * size:(slot + 1) * size] != column.data[prev * size:(prev + 1) * size]:
+                    names.append(name)
+                    break
+                slot = prev
+
+        return names
+
+    def format(self, name, raw):
+        try:
+            return gdb.Value(raw, self.types[name]).format_string()
+        except (KeyError, gdb.error, TypeError):
+            return "0x" + raw[::-1].hex()
+
+history = History()
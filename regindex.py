@@ -0,0 +1,188 @@
+# Index of where each register changes in a trace.
+#
+# For each register the steps which changed it are kept as a sorted array, so the
+# last change before step N or the first after it is a binary search rather than a
+# scan of the trace. Registers with a decoder (cpsr, fpsr, fpscr) also have their
+# value decoded into flags each time they change: each flag gets a sorted array of
+# the steps where it became set, and a bitset with bit i set when the flag is set
+# after step i, so "set at step N" is one bit and "steps where both are set" is an
+# and of two bitsets. While the trace is added the runs of steps each flag is set
+# for are kept, and each bitset is made from them once at the end, in a bytearray.
+#
+# index = regindex.ChangeIndex({"fpsr": lambda bits: decode_fpsr(bits).split()})
+# index.build_trace(regtrace.trace)
+# step = index.before("x3", 1000)             # last step before 1000 which changed x3
+# step = index.after("fpsr.DZC", 1000)        # first step after 1000 where fpsr gained DZC
+# index.at("fpsr.DZC", 1000)                  # is DZC set after step 1000
+# steps = index.where(["fpsr.DZC", "cpsr.Z"]) # steps where both are set
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+class ChangeIndex(object):
+
+    def __init__(self, decoders=None):
+        self.decoders = decoders or {}  # name -> function(int) returning the names of the flags set
+        self.clear()
+
+    def clear(self):
+        self.source = ""
+        self.steps = 0
+        self.changes = {}  # name -> array of the steps which changed the register
+        self.gained = {}   # "name.FLAG" -> array of the steps where the flag became set
+        self.bits = {}     # "name.FLAG" -> bitset, bit i set when the flag is set after step i
+        self.runs = {}     # "name.FLAG" -> array of the first and end steps of each run it was set
+        self.flags = {}    # name -> flags set after the last step added
+        self.since = {}    # "name.FLAG" -> step the flag has been set since
+
+    def __len__(self):
+        return self.steps
+
+    #--------------------------
+    # building
+
+    def begin(self, source, start):
+        """start is name -> raw bytes before the first step"""
+        self.clear()
+        self.source = source
+        for name, raw in start.items():
+            self.changes[name] = array('I')
+            if name in self.decoders:
+                self.flags[name] = set()
+                self.decode(name, 0, raw, False)
+
+    def add(self, step, changes):
+        """index the (name, raw bytes) of the registers changed by step"""
+        for name, raw in changes:
+            if not name in self.changes:
+                self.changes[name] = array('I')
+            self.changes[name].append(step)
+            if name in self.flags:
+                self.decode(name, step, raw, True)
+        self.steps = step + 1
+
+    def decode(self, name, step, raw, gained):
+        flags = set(self.decoders[name](int.from_bytes(raw, 'little')))
+        old = self.flags[name]
+        for flag in flags - old:
+            key = f'{name}.{flag}'
+            if gained:
+                self.gained.setdefault(key, array('I')).append(step)
+            self.since[key] = step
+        for flag in old - flags:
+            self.close(f'{name}.{flag}', step)
+        self.flags[name] = flags
+
+    def close(self, key, end):
+        runs = self.runs.setdefault(key, array('I'))
+        runs.append(self.since.pop(key))
+        runs.append(end)
+        self.gained.setdefault(key, array('I'))
+
+    def end(self):
+        for key in list(self.since):
+            self.close(key, self.steps)
+        for key, runs in self.runs.items():
+            self.bits[key] = bitset(runs, self.steps)
+        self.runs = {}
+        self.flags = {}
+
+    def build_trace(self, trace):
+        """index a regtrace.Trace"""
+        self.begin("trace", {name: raw for name, raw in trace.start.items() if name != "pc"})
+        for step in range(len(trace)):
+            self.add(step, trace.deltas(step))
+        self.steps = len(trace)
+        self.end()
+
+    def build_file(self, reader, source):
+        """index a tracefile.TraceReader, its first step is the start"""
+        names = reader.names
+        self.begin(source, {})
+        for step, pc, changed, values in reader.steps_from(0, len(reader)):
+            if step == 0:
+                self.begin(source, dict(zip(names, values)))
+            else:
+                self.add(step, [(names[n], values[n]) for n in changed])
+        self.steps = len(reader)
+        self.end()
+
+    #--------------------------
+    # queries, key is a register name or name.FLAG for the steps where the flag became set
+
+    def lookup(self, key):
+        name, dot, flag = key.partition(".")
+        if dot:
+            key = f'{name}.{flag.upper()}'
+            if not name in self.decoders or not name in self.changes:
+                raise KeyError(f'{name} has no flags indexed')
+            return self.gained.get(key, array('I'))
+        elif not name in self.changes:
+            raise KeyError(f'{name} not in the index')
+        return self.changes[name]
+
+    def before(self, key, step):
+        """last step before step in key, None if there is none"""
+        steps = self.lookup(key)
+        i = bisect_left(steps, step)
+        return steps[i - 1] if i else None
+
+    def after(self, key, step):
+        """first step after step in key, None if there is none"""
+        steps = self.lookup(key)
+        i = bisect_right(steps, step)
+        return steps[i] if i < len(steps) else None
+
+    def between(self, key, first, last):
+        """steps in key from first up to but not including last"""
+        steps = self.lookup(key)
+        return steps[bisect_left(steps, first):bisect_left(steps, last)]
+
+    def mask(self, key):
+        name, dot, flag = key.partition(".")
+        if not dot:
+            raise KeyError(f'{key} is not a flag, register.FLAG expected')
+        self.lookup(key)
+        return self.bits.get(f'{name}.{flag.upper()}', 0)
+
+    def at(self, key, step):
+        """True if the flag in key is set after step"""
+        return bool(self.mask(key) >> step & 1)
+
+    def where(self, keys, first=0, count=None):
+        """(number of steps where every flag in keys is set, the first count of them from first)"""
+        bits = (1 << self.steps) - 1
+        for key in keys:
+            bits &= self.mask(key)
+        total = bin(bits).count("1")
+        bits = bits >> first << first
+        steps = []
+        while bits and (count is None or len(steps) < count):
+            low = bits & -bits
+            steps.append(low.bit_length() - 1)
+            bits ^= low
+        return total, steps
+
+    def summary(self):
+        changes = sum(len(steps) for steps in self.changes.values())
+        return f'{self.source}: {self.steps} steps, {len(self.changes)} registers, {changes} changes, ' \
+               f'{len(self.bits)} flags'
+
+def bitset(runs, steps):
+    """int with the bits from each first step up to its end step set"""
+    bitmap = bytearray((steps + 7) // 8)
+    for i in range(0, len(runs), 2):
+        start, end = runs[i], runs[i + 1]
+        if start == end:
+            continue
+        first, last = start >> 3, end >> 3
+        if first == last:
+            bitmap[first] |= (1 << (end & 7)) - (1 << (start & 7))
+            continue
+        bitmap[first] |= 0x100 - (1 << (start & 7))
+        bitmap[first + 1:last] = b'\xff' * (last - first - 1)
+        if end & 7:
+            bitmap[last] |= (1 << (end & 7)) - 1
+    return int.from_bytes(bitmap, 'little')
+
+index = ChangeIndex()
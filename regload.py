@@ -0,0 +1,82 @@
+# One script to source for the register and vector windows and the info commands.
+#
+# so general.py, so vector.py and so infogsd.py each compile and run the whole
+# script when gdb starts: its register dicts, Register classes, gdb type lookups
+# and shared modules, before any of it is used. Sourcing this instead registers
+# small stand-in commands and window types under the same names and nothing else.
+# The first time one of them is used the script behind it is run, which registers
+# its own commands and windows in their place, as sourcing it would have, and the
+# command or window is passed on to them. From then on gdb calls the script's
+# directly.
+#
+# The register command and window load general-riscv.py when the target is RISC-V
+# and general.py otherwise, so which one is picked follows the target rather than
+# the machine gdb runs on.
+#
+# so general.py or so aarch64pp.py still runs a script at once rather than on first
+# use, with or without this sourced first.
+#
+# so regload.py
+# tui new-layout regs register 1 vector 1 src 1 cmd 1
+
+from os.path import abspath, dirname, join
+
+ROOT = dirname(abspath(__file__))
+gdb.execute(f'source {join(ROOT, "regpath.py")}')
+
+import regtable
+
+scripts = {}    # script -> the globals it ran in, once it has been run
+
+def load(script):
+    """run script once, the way so would, its globals"""
+    try:
+        return scripts[script]
+    except KeyError:
+        pass
+
+    path = join(ROOT, script)
+    g = {"__name__": "__main__", "__file__": path, "gdb": gdb}
+    with open(path) as f:
+        exec(compile(f.read(), path, 'exec'), g)
+    scripts[script] = g
+    return g
+
+def register_script():
+    """general-riscv.py for a RISC-V target, general.py otherwise, whichever ran already if one has"""
+    for script in ("general.py", "general-riscv.py"):
+        if script in scripts:
+            return script
+    return "general-riscv.py" if regtable.architecture().startswith("riscv") else "general.py"
+
+class LazyCmd(gdb.Command):
+    """Loads the script which defines this command the first time it is used.
+Once it has run, help gives the command's own help."""
+
+    def __init__(self, name, script):
+        super().__init__(name, gdb.COMMAND_DATA)
+        self.name = name
+        self.script = script    # script name, or a function giving it
+
+    def invoke(self, arguments, from_tty):
+        script = self.script() if callable(self.script) else self.script
+        if script in scripts:
+            # it ran and this is still the command, so the script has none by this name
+            print(f'{self.name}: not defined by {script}')
+            return
+        load(script)
+        gdb.execute(f'{self.name} {arguments}', from_tty)
+
+def lazy_window(script, factory):
+    def create(tui):
+        name = script() if callable(script) else script
+        return load(name)[factory](tui)
+    return create
+
+LazyCmd("register", register_script)
+LazyCmd("vector", "vector.py")
+for name in ["info general", "info single", "info double", "info vector"]:
+    LazyCmd(name, "infogsd.py")
+
+gdb.register_window_type("register", lazy_window(register_script, "RegisterFactory"))
+gdb.register_window_type("vector", lazy_window("vector.py", "VectorWinFactory"))
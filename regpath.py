@@ -0,0 +1,11 @@
+# Put the directory holding the scripts and their shared modules (regsnap, regfmt...)
+# on sys.path. Every script sources this before importing them, so any one of them
+# can be sourced on its own, or through regload.py.
+#
+# gdb.execute(f'source {join(dirname(abspath(__file__)), "regpath.py")}')
+
+import sys
+from os.path import abspath, dirname
+
+if dirname(abspath(__file__)) not in sys.path:
+    sys.path.append(dirname(abspath(__file__)))
@@ -0,0 +1,150 @@
+# Predicates over the raw register bytes.
+#
+# A predicate is a Python expression whose names are registers, written the way the
+# register and vector commands write them: x0, w3, sp, s2 (a float), v1.s.f (the
+# lanes of v1 as floats), v1.s.f[2] (one lane), x0.s (x0 signed), fpsr.DZC (a flag
+# as decode_fpsr gives it). It is compiled once into a Python function and each
+# evaluation only unpacks the bytes of the registers it names, read through the
+# snapshot, so no gdb expression is parsed or evaluated.
+#
+# Integer registers and lanes are unsigned unless typed .s, h, s and d registers
+# are floats unless typed .u. isnan and isinf are true if any lane is.
+#
+# pred = regpred.Predicate("v1.s.f[2] > 0.5 and x0 == 5")
+# pred = regpred.Predicate("fpsr.DZC or isnan(v0.d.f)", regindex.index.decoders)
+# if pred(): ...
+
+import math
+import re
+import struct
+
+import regsnap
+
+SIZES = {'b': 1, 'h': 2, 's': 4, 'd': 8, 'q': 16}
+FLOAT_CODE = {2: 'e', 4: 'f', 8: 'd'}
+INT_CODE = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+# a number, so 1e5 is not taken for a register, or a register with its specifiers and lane
+TOKEN = re.compile(r"(0[xX][0-9a-fA-F]+|\d+\.?\d*(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)(?:\[(\d+)\])?")
+FLOAT_REG = re.compile(r"^[hsd]\d+$")
+
+def any_lane(test):
+    return lambda x: any(map(test, x)) if isinstance(x, tuple) else test(x)
+
+FUNCTIONS = {"__builtins__": {}, "isnan": any_lane(math.isnan), "isinf": any_lane(math.isinf),
+             "any": any, "all": all, "abs": abs, "min": min, "max": max, "len": len,
+             "nan": math.nan, "inf": math.inf, "True": True, "False": False}
+
+WORDS = {"and", "or", "not", "in", "is", "if", "else"} | set(FUNCTIONS)
+
+class Reference(object):
+
+    def __init__(self, name, specs, index, decoders):
+        self.name = name
+        self.index = index
+        self.flag = None
+        self.width = None
+        self.type = None
+        self.structs = {}    # raw size -> struct for the lanes
+
+        if len(specs) == 1 and name in decoders:
+            self.flag = specs[0].upper()
+            self.decoder = decoders[name]
+            return
+
+        if len(specs) == 2:
+            self.width, self.type = specs
+        elif len(specs) == 1 and name[0:1] == 'v':
+            self.width = specs[0]
+        elif len(specs) == 1:
+            self.type = specs[0]
+        elif specs:
+            raise SyntaxError(f'{name}.{".".join(specs)}: register[.width][.type] expected')
+
+        if self.width is not None and not self.width in SIZES:
+            raise SyntaxError(f'{name}: width b, h, s, d or q expected: {self.width}')
+        if self.type is None:
+            self.type = 'f' if self.width is None and FLOAT_REG.match(name) else 'u'
+        elif not self.type in ('f', 's', 'u'):
+            raise SyntaxError(f'{name}: type f, s or u expected: {self.type}')
+
+    def lanes(self, raw):
+        size = SIZES[self.width] if self.width else len(raw)
+        if self.type == 'f':
+            try:
+                unpack = self.structs[len(raw)]
+            except KeyError:
+                if not size in FLOAT_CODE:
+                    raise ValueError(f'{self.name}: no {size * 8} bit float')
+                unpack = self.structs[len(raw)] = struct.Struct(f'<{len(raw) // size}{FLOAT_CODE[size]}')
+            return unpack.unpack(raw)
+        elif size in INT_CODE:
+            try:
+                unpack = self.structs[len(raw)]
+            except KeyError:
+                code = INT_CODE[size].lower() if self.type == 's' else INT_CODE[size]
+                unpack = self.structs[len(raw)] = struct.Struct(f'<{len(raw) // size}{code}')
+            return unpack.unpack(raw)
+
+        signed = self.type == 's'
+        return tuple(int.from_bytes(raw[i:i + size], 'little', signed=signed) for i in range(0, len(raw), size))
+
+    def value(self, raw):
+        if self.flag is not None:
+            return self.flag in self.decoder(int.from_bytes(raw, 'little'))
+
+        lanes = self.lanes(raw)
+        if self.index is not None:
+            try:
+                return lanes[self.index]
+            except IndexError:
+                raise ValueError(f'{self.name}: no lane {self.index}')
+        return lanes if self.width else lanes[0]
+
+def parse(text, decoders=None):
+    """the Reference for one register spec: x0, w3.s, v1.s.f[2], fpsr.DZC"""
+    match = TOKEN.fullmatch(text.strip())
+    if match is None or match.group(2) is None:
+        raise SyntaxError(f'{text}: register[.width][.type][[lane]] expected')
+    name, *specs = match.group(2).split(".")
+    index = match.group(3)
+    return Reference(name, specs, int(index) if index else None, decoders or {})
+
+class Predicate(object):
+
+    def __init__(self, text, decoders=None):
+        self.text = text
+        self.decoders = decoders or {}
+        self.refs = []
+        self.args = {}    # reference text -> argument name of its value
+        source = TOKEN.sub(self.reference, text)
+        try:
+            self.test = eval(compile(f'lambda {", ".join(self.args.values())}: ({source})', "<predicate>", "eval"),
+                             FUNCTIONS)
+        except SyntaxError as err:
+            raise SyntaxError(f'{text}: {err.msg}')
+        self.names = list(dict.fromkeys(ref.name for ref in self.refs))
+
+    def reference(self, match):
+        number, word, index = match.groups()
+        if number or word in WORDS and index is None:
+            return match.group(0)
+
+        text = match.group(0)
+        if not text in self.args:
+            self.args[text] = f'_{len(self.refs)}'
+            self.refs.append(parse(text, self.decoders))
+        return self.args[text]
+
+    def __call__(self, read=None):
+        """evaluate with read(name) giving the raw bytes, the snapshot by default"""
+        read = read or regsnap.snapshot.read_raw
+        return bool(self.test(*[ref.value(read(ref.name)) for ref in self.refs]))
+
+    def values(self, read=None):
+        """reference text -> value, to show why a predicate was true"""
+        read = read or regsnap.snapshot.read_raw
+        return {text: ref.value(read(ref.name)) for text, ref in zip(self.args, self.refs)}
+
+    def __str__(self):
+        return self.text
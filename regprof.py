@@ -0,0 +1,131 @@
+# Opt-in profiling of the window refreshes.
+#
+# Each script names the functions which make up a refresh with instrument(). Nothing
+# is wrapped until the profiler is turned on, so when it is off the windows run the
+# original functions and pay nothing. When on, each call is timed and its own time
+# (less the time of the instrumented calls it makes) is added to its phase, and to
+# its register when the function works on one. A record is kept per stop for the
+# last N stops.
+#
+# regprof.profiler.instrument(regsnap.Snapshot, "read", "read_register", lambda args: args[1])
+# regprof.profiler.enable(100)
+# print(regprof.profiler.summary())
+
+import gdb
+from collections import deque
+from time import perf_counter
+
+class Profiler(object):
+
+    def __init__(self):
+        self.enabled = False
+        self.points = {}      # (class, attribute) -> (phase, key function)
+        self.wrapped = []     # (class, attribute, original function) while enabled
+        self.history = deque(maxlen=100)
+        self.phases = {}      # phase -> [seconds, calls] for the stop being profiled
+        self.registers = {}   # register -> [seconds, calls] for the stop being profiled
+        self.children = []    # time spent in instrumented calls, one entry per active call
+
+    def instrument(self, owner, attr, phase, key=None):
+        """time owner.attr as phase, key(args) names the register the call is for"""
+        self.points[(owner, attr)] = (phase, key)
+        if self.enabled:
+            self.wrap(owner, attr, phase, key)
+
+    def wrap(self, owner, attr, phase, key):
+        if not attr in owner.__dict__:
+            return
+
+        function = owner.__dict__[attr]
+        profiler = self
+
+        def timed(*args, **kwargs):
+            profiler.children.append(0.0)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                own = elapsed - profiler.children.pop()
+                if profiler.children:
+                    profiler.children[-1] += elapsed
+                profiler.add(profiler.phases, phase, own)
+                if key:
+                    profiler.add(profiler.registers, key(args), own)
+
+        setattr(owner, attr, timed)
+        self.wrapped.append((owner, attr, function))
+
+    def add(self, table, name, seconds):
+        try:
+            entry = table[name]
+            entry[0] += seconds
+            entry[1] += 1
+        except KeyError:
+            table[name] = [seconds, 1]
+
+    def enable(self, stops=None):
+        if stops:
+            self.history = deque(self.history, maxlen=stops)
+        if self.enabled:
+            return
+
+        self.enabled = True
+        for (owner, attr), (phase, key) in self.points.items():
+            self.wrap(owner, attr, phase, key)
+        gdb.events.stop.connect(self.new_stop)
+
+    def disable(self):
+        if not self.enabled:
+            return
+
+        self.enabled = False
+        for owner, attr, function in reversed(self.wrapped):
+            setattr(owner, attr, function)
+        self.wrapped = []
+        self.children = []
+        gdb.events.stop.disconnect(self.new_stop)
+
+    def clear(self):
+        self.history.clear()
+        self.phases = {}
+        self.registers = {}
+
+    def new_stop(self, event=None):
+        if self.phases:
+            self.history.append((self.phases, self.registers))
+        self.phases = {}
+        self.registers = {}
+
+    def totals(self):
+        """(phases, registers, stops) summed over the kept stops and the current one"""
+        phases = {}
+        registers = {}
+        records = list(self.history) + ([(self.phases, self.registers)] if self.phases else [])
+        for stop_phases, stop_registers in records:
+            for total, table in ((phases, stop_phases), (registers, stop_registers)):
+                for name, (seconds, calls) in table.items():
+                    entry = total.setdefault(name, [0.0, 0])
+                    entry[0] += seconds
+                    entry[1] += calls
+
+        return phases, registers, len(records)
+
+    def summary(self, top=20):
+        phases, registers, stops = self.totals()
+        if stops == 0:
+            return "no stops profiled"
+
+        all = sum(seconds for seconds, calls in phases.values()) or 1.0
+        lines = [f'{stops} stops, {all * 1000 / stops:.3f} ms per stop',
+                 f'{"phase":<16}{"ms/stop":>10}{"calls/stop":>12}{"%":>7}']
+        for name, (seconds, calls) in sorted(phases.items(), key=lambda item: -item[1][0]):
+            lines.append(f'{name:<16}{seconds * 1000 / stops:>10.3f}{calls / stops:>12.1f}{seconds * 100 / all:>7.1f}')
+
+        lines.append(f'{"register":<16}{"us/stop":>10}{"calls/stop":>12}{"%":>7}')
+        for name, (seconds, calls) in sorted(registers.items(), key=lambda item: -item[1][0])[:top]:
+            lines.append(f'{name:<16}{seconds * 1e6 / stops:>10.1f}{calls / stops:>12.1f}{seconds * 100 / all:>7.1f}')
+
+        return "\n".join(lines)
+
+profiler = Profiler()
@@ -0,0 +1,98 @@
+# Registers of the instructions seen while replaying a recording.
+#
+# Under record full, reverse-stepi and stepi move through the recorded execution
+# and every register read at a stop goes through gdb's replay machinery. The
+# registers at a recorded instruction never change, so the raw bytes read there are
+# kept, keyed by thread and record instruction number, and stepping back and forth
+# over the same instructions reads them from here instead. The instructions either
+# side of the one shown are the true neighbours in execution order, so a register is
+# shown as changed against the instruction before it, or the one after it when
+# stepping back into instructions not seen yet, rather than against whatever was
+# shown last.
+#
+# replay = regrecord.Replay(10000)
+# step = replay.lookup(frame)     # name -> raw bytes, None when not replaying
+# before = replay.neighbour()
+
+import gdb
+import re
+from collections import OrderedDict
+
+CURRENT = re.compile(r"Current instruction number is (\d+)")
+
+class Replay(object):
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize     # instructions kept
+        self.steps = OrderedDict() # (thread, instruction number) -> name -> raw bytes
+        self.key = None            # (thread, instruction number) shown, None when not replaying
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.steps)
+
+    def clear(self, event=None):
+        self.steps.clear()
+        self.key = None
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        while len(self.steps) > self.maxsize:
+            self.steps.popitem(last=False)
+
+    def position(self):
+        """the record instruction number being replayed, None when not replaying"""
+        try:
+            recording = gdb.current_recording()
+        except AttributeError:
+            return None
+        if recording is None:
+            # the recording stopped, a new one numbers its instructions from 1 again
+            if self.steps:
+                self.clear()
+            return None
+
+        try:
+            position = recording.replay_position    # btrace
+            return position.number if position is not None else None
+        except NotImplementedError:
+            pass
+
+        # full only says where it is in info record, and only while replaying
+        match = CURRENT.search(gdb.execute("info record", to_string=True))
+        return int(match.group(1)) if match else None
+
+    def lookup(self, frame):
+        """name -> raw bytes cached for the instruction the frame is at, None when not replaying"""
+        self.key = None
+        if frame.level() != 0:
+            return None
+        try:
+            position = self.position()
+        except gdb.error:
+            return None
+        if position is None:
+            return None
+
+        self.key = (gdb.selected_thread().global_num, position)
+        step = self.steps.get(self.key)
+        if step is None:
+            self.misses += 1
+            step = self.steps[self.key] = {}
+            if len(self.steps) > self.maxsize:
+                self.steps.popitem(last=False)
+        else:
+            self.hits += 1
+            self.steps.move_to_end(self.key)
+        return step
+
+    def neighbour(self):
+        """name -> raw bytes of the instruction before the one shown, or after it if that has not been seen"""
+        thread, position = self.key
+        before = self.steps.get((thread, position - 1))
+        return before if before else self.steps.get((thread, position + 1))
+
+    def summary(self):
+        where = f'instruction {self.key[1]}' if self.key else "not replaying"
+        return f'{where}, {len(self.steps)}/{self.maxsize} instructions, {self.hits} hits, {self.misses} misses'
@@ -0,0 +1,445 @@
+# Shared register snapshot for the TUI windows and info commands.
+#
+# Each window tells the snapshot which registers it displays and subscribes a
+# callback. A register is read from gdb the first time it is asked for after a stop
+# and kept until the next one, so a register shown by the register, vector and arm64
+# windows together costs one read_register per stop rather than one per window.
+# Registers a window has scrolled out of view are not read at all. The bytes of each
+# register are kept from the last stop it was read at, so one scrolled back into view
+# is shown as changed against the last time it was seen, by any window.
+#
+# import regsnap
+# regsnap.snapshot.track(["x0", "v1"])
+# regsnap.snapshot.subscribe(win.create_register)
+# val = regsnap.snapshot.read("x0")
+#
+# The registers are only read again when something could have changed them: a stop,
+# cont, a register or memory write by the user, or a different thread or frame being
+# selected. The generation counter goes up each time the snapshot is re-read, so a
+# window which built its lines for the current generation just redraws them.
+#
+# Registers which are a view of a larger physical register (w3 of x3, s3 of v3 on
+# AArch64, s6 and d3 of q1 on Armv8-a) are cut out of the physical register's raw
+# bytes, so a window showing x3 w3 s3 d3 v3 costs two reads.
+#
+# A recorded step can be shown in place of the target with browse (see regtime):
+# reads then come from the view's raw bytes and changed compares with the step
+# before rather than with what the window last drew. Anything which invalidates
+# the snapshot goes back to the target.
+#
+# While a recording is replayed the raw bytes read at each instruction are kept by
+# record instruction number (see regrecord), so stepping back over instructions
+# already seen reads nothing from gdb and changed compares with the instruction
+# before rather than with what was shown last.
+#
+# The windows are not drawn at the prompt itself: the draw is posted with
+# gdb.post_event and reads the registers when it runs. Stops which arrive before it
+# has run, holding Enter on si, only make it draw their state, and a draw less than
+# debounce seconds after the last one waits out the rest of the interval on a timer.
+# Whatever the stepping, the last stop is always drawn.
+#
+# Registers are read with the gdb.RegisterDescriptor the target's register table
+# (see regtable) has for them rather than by name. The table is looked up again
+# whenever the architecture changes and after the inferior exits, as the next run
+# can be on another target.
+#
+# With a budget set a draw stops formatting rows once budget seconds have gone and
+# the windows show what they drew last, greyed, for the rows they did not get to.
+# They finish them with later(), each posted slice getting a budget of its own, so
+# the prompt is never held much past the budget however many registers are shown.
+
+import gdb
+import struct
+import threading
+from time import monotonic
+
+import regprof
+import regrecord
+import regtable
+
+#--------------------------
+# alias registers: name -> (physical register, byte offset, size)
+
+def aarch64_alias(name):
+    num = name[1:]
+    if not num.isdigit():
+        return None
+
+    if name[0:1] == 'w':
+        return ('x' + num, 0, 4)
+
+    size = {'b': 1, 'h': 2, 's': 4, 'd': 8, 'q': 16}.get(name[0:1])
+    return ('v' + num, 0, size) if size else None
+
+def armv8a_alias(name):
+    num = name[1:]
+    if not num.isdigit() or int(num) > 31:
+        return None
+
+    num = int(num)
+    if name[0:1] == 's':
+        return (f'q{num // 4}', num % 4 * 4, 4)
+    elif name[0:1] == 'd':
+        return (f'q{num // 2}', num % 2 * 8, 8)
+
+    return None
+
+def arch_alias(arch):
+    if arch.startswith("aarch64"):
+        return aarch64_alias
+    elif arch.startswith("arm"):
+        return armv8a_alias
+    return None
+
+def raw_bytes(val):
+    """the register contents as little endian bytes"""
+    try:
+        return val.bytes    # gdb 14
+    except AttributeError:
+        pass
+
+    type = val.type.strip_typedefs()
+    if type.code == gdb.TYPE_CODE_FLT:
+        return struct.pack({2: '<e', 4: '<f', 8: '<d'}[type.sizeof], float(val))
+    elif type.code == gdb.TYPE_CODE_ARRAY:
+        return b"".join(raw_bytes(val[i]) for i in range(type.range()[1] + 1))
+    elif type.code == gdb.TYPE_CODE_UNION:
+        # vector unions: use the unsigned integer view which covers the whole register
+        for field in type.fields():
+            ftype = field.type.strip_typedefs()
+            if ftype.sizeof == type.sizeof and ftype.code in (gdb.TYPE_CODE_ARRAY, gdb.TYPE_CODE_UNION) \
+               or ftype.sizeof == type.sizeof <= 8 and ftype.code == gdb.TYPE_CODE_INT:
+                return raw_bytes(val[field.name])
+        raise ValueError(f"no integer view of {type}")
+
+    return (int(val) & ((1 << type.sizeof * 8) - 1)).to_bytes(type.sizeof, 'little')
+
+class Snapshot(object):
+
+    def __init__(self):
+        self.tracked = {}    # name -> number of windows displaying it
+        self.values = {}     # name -> gdb.Value read at this stop
+        self.frame = None
+        self.thread = None
+        self.listeners = []
+        self.reads = 0
+        self.dirty = True
+        self.generation = 0
+        self.arch = None
+        self.table = None    # regtable.Table of the architecture, None if gdb has no registers()
+        self.alias = None
+        self.types = {}      # alias name -> gdb.Type, learnt from the first real read
+        self.raw = {}        # name -> raw bytes at this stop
+        self.previous = {}   # name -> raw bytes at the last stop it was read at
+        self.view = None     # regtime view shown instead of the target
+        self.replay = regrecord.Replay()
+        self.step = None     # name -> raw bytes kept for the instruction being replayed
+        self.debounce = 0.02 # seconds from one draw to the next, None to draw at every prompt
+        self.pending = False # a draw is posted and has not run yet
+        self.drawn = 0.0     # monotonic time of the last draw
+        self.draws = 0
+        self.coalesced = 0   # prompts drawn by a draw posted for an earlier one
+        self.budget = None   # seconds a draw or slice may spend formatting rows, None for no limit
+        self.deadline = None # monotonic time the running draw or slice should stop by
+        self.slices = 0
+        self.longest = 0.0   # seconds of the longest draw or slice
+
+    def track(self, names):
+        for name in names:
+            self.tracked[name] = self.tracked.get(name, 0) + 1
+
+    def untrack(self, names):
+        for name in names:
+            count = self.tracked.get(name, 0) - 1
+            if count > 0:
+                self.tracked[name] = count
+            else:
+                self.tracked.pop(name, None)
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        try:
+            self.listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def keep(self):
+        """remember the raw bytes read from the target before they are thrown away, to compare the next stop with"""
+        if self.view is None:
+            self.previous.update(self.raw)
+
+    def invalidate(self, event=None):
+        self.keep()
+        self.values = {}
+        self.raw = {}
+        self.frame = None
+        self.dirty = True
+        self.step = None
+        if self.view is not None:
+            self.view.close()
+            self.view = None
+
+    def browse(self, view):
+        """show the registers of a recorded step, None for the target"""
+        self.keep()
+        self.view = view
+        self.values = {}
+        self.raw = {}
+        self.generation += 1
+        self.notify(list(self.listeners))
+
+    def moved(self):
+        """True if the user selected another thread or frame since the snapshot was read"""
+        thread = gdb.selected_thread()
+        if thread is not None:
+            thread = thread.global_num
+
+        if thread != self.thread:
+            return True
+
+        if self.frame is None:
+            return False
+
+        try:
+            return gdb.selected_frame() != self.frame
+        except gdb.error:
+            return True
+
+    def check(self):
+        if self.moved():
+            self.invalidate()
+
+    def live(self):
+        """stop browsing, for a command which reads the target rather than a recorded step"""
+        if self.view is not None:
+            self.invalidate()
+
+    def selected_frame(self):
+        """raises gdb.error when there is no frame"""
+        if self.frame is None:
+            self.frame = gdb.selected_frame()
+            arch = self.frame.architecture()
+            if arch.name() != self.arch:
+                self.set_arch(arch)
+            self.step = self.replay.lookup(self.frame)
+        return self.frame
+
+    def set_arch(self, arch):
+        self.arch = arch.name()
+        self.types = {}
+        self.table = regtable.load(arch)
+        self.alias = arch_alias(self.arch)
+        if self.alias and not "little" in gdb.execute("show endian", to_string=True):
+            self.alias = None
+
+    def exited(self, event=None):
+        self.invalidate()
+        self.arch = None    # the next run may be on another target
+
+    def has(self, name):
+        """False if the target has no register name, True when it can't tell without a frame or a table"""
+        try:
+            self.selected_frame()
+        except gdb.error:
+            return True
+        if self.table is None or name in self.table:
+            return True
+        try:
+            self.read(name)    # a user alias, lr or the RISC-V ABI names
+            return True
+        except (gdb.error, ValueError):
+            return False
+
+    def register(self, name):
+        """what read_register is given for name: its descriptor, or the name for gdb to look up"""
+        if self.table is None:
+            return name
+        return self.table.descriptor(name) or name
+
+    def read(self, name):
+        try:
+            return self.values[name]
+        except KeyError:
+            pass
+
+        if self.view is not None:
+            val = self.values[name] = gdb.Value(self.read_raw(name), self.type(name))
+            return val
+
+        frame = self.selected_frame()
+        val = None
+        if self.step is not None and name in self.step and name in self.types:
+            # seen before at this instruction of the recording
+            self.raw[name] = self.step[name]
+            val = gdb.Value(self.step[name], self.types[name])
+        elif self.alias:
+            val = self.derive(name)
+        if val is None:
+            val = frame.read_register(self.register(name))
+            self.reads += 1
+            self.types[name] = val.type
+
+        self.values[name] = val
+        return val
+
+    def type(self, name):
+        """the gdb.Type of name: recorded by the view, learnt at an earlier stop, or read from the target once"""
+        try:
+            return self.view.types[name] if self.view and name in self.view.types else self.types[name]
+        except KeyError:
+            pass
+
+        if self.view is not None:
+            # nothing is read while browsing, the program may have exited
+            try:
+                arch = gdb.selected_inferior().architecture()
+                type = self.view.types[name] = arch.integer_type(len(self.read_raw(name)) * 8, False)
+                return type
+            except (AttributeError, ValueError):
+                pass    # before gdb 12, or a size with no integer type
+
+        frame = self.selected_frame()
+        self.types[name] = frame.read_register(self.register(name)).type
+        self.reads += 1
+        return self.types[name]
+
+    def derive(self, name):
+        """build an alias register from its physical register, None if it has to be read"""
+        alias = self.alias(name)
+        if alias is None or not name in self.types:
+            return None
+
+        physical, offset, size = alias
+        try:
+            raw = self.read_raw(physical)
+        except (gdb.error, ValueError):
+            return None
+
+        try:
+            val = gdb.Value(raw[offset:offset + size], self.types[name])
+        except (gdb.error, TypeError):
+            return None
+
+        self.raw[name] = raw[offset:offset + size]
+        return val
+
+    def read_raw(self, name):
+        """the register contents as little endian bytes"""
+        try:
+            return self.raw[name]
+        except KeyError:
+            pass
+
+        if self.view is not None:
+            self.raw[name] = self.view.raw(name)
+            return self.raw[name]
+
+        val = self.read(name)
+        if not name in self.raw:
+            self.raw[name] = raw_bytes(val)
+        if self.step is not None:
+            self.step[name] = self.raw[name]
+        return self.raw[name]
+
+    def changed(self, name, old, raw):
+        """True if name is shown as changed: raw against the stop it was last read at, in a view against
+        the step before, old (the bytes the window drew) for a register the snapshot has never read"""
+        if self.view is not None:
+            return self.view.changed(name)
+        elif self.step is not None:
+            neighbour = self.replay.neighbour()
+            if neighbour and name in neighbour:
+                return neighbour[name] != raw
+        return raw != self.previous.get(name, old)
+
+    def refresh(self):
+        # values read on demand since the last invalidate are still good
+        self.dirty = False
+        self.generation += 1
+        thread = gdb.selected_thread()
+        self.thread = thread.global_num if thread is not None else None
+        try:
+            self.selected_frame()
+        except gdb.error:
+            pass
+
+    def update(self):
+        if self.debounce is None:
+            self.draw()
+        elif self.pending:
+            self.coalesced += 1
+        else:
+            self.pending = True
+            wait = self.drawn + self.debounce - monotonic()
+            if wait > 0:
+                timer = threading.Timer(wait, gdb.post_event, [self.draw])
+                timer.daemon = True
+                timer.start()
+            else:
+                gdb.post_event(self.draw)
+
+    def draw(self):
+        self.pending = False
+        thread = gdb.selected_thread()
+        if thread is not None and thread.is_running():
+            return    # the stop which ends the run posts another
+
+        self.check()
+        if self.dirty:
+            self.refresh()
+
+        self.drawn = monotonic()
+        self.draws += 1
+        self.notify(list(self.listeners))
+
+    def notify(self, callbacks):
+        start = monotonic()
+        self.deadline = start + self.budget if self.budget is not None else None
+        try:
+            for callback in callbacks:
+                callback()
+        finally:
+            self.deadline = None
+            self.longest = max(self.longest, monotonic() - start)
+
+    def expired(self):
+        """True once the draw or slice running has used up its budget"""
+        return self.deadline is not None and monotonic() > self.deadline
+
+    def later(self, callback):
+        """post callback to finish a window's rows in a slice with a budget of its own,
+        dropped if the snapshot has moved on by the time it runs"""
+        generation = self.generation
+
+        def run():
+            if generation != self.generation or self.dirty:
+                return    # the draw for the new state redoes the rows
+            thread = gdb.selected_thread()
+            if thread is not None and thread.is_running():
+                return
+            self.slices += 1
+            self.notify([callback])
+
+        gdb.post_event(run)
+
+snapshot = Snapshot()
+
+gdb.events.stop.connect(snapshot.invalidate)
+gdb.events.cont.connect(snapshot.invalidate)
+gdb.events.exited.connect(snapshot.exited)
+gdb.events.register_changed.connect(snapshot.invalidate)
+gdb.events.memory_changed.connect(snapshot.invalidate)
+gdb.events.inferior_call.connect(snapshot.invalidate)
+gdb.events.before_prompt.connect(snapshot.update)
+# a write while replaying throws away the recorded execution after it
+gdb.events.register_changed.connect(snapshot.replay.clear)
+gdb.events.memory_changed.connect(snapshot.replay.clear)
+
+regprof.profiler.instrument(Snapshot, "refresh", "refresh")
+regprof.profiler.instrument(Snapshot, "moved", "selected_frame")
+regprof.profiler.instrument(Snapshot, "selected_frame", "selected_frame")
+regprof.profiler.instrument(Snapshot, "read", "read_register", lambda args: args[1])
+regprof.profiler.instrument(Snapshot, "read_raw", "raw bytes", lambda args: args[1])
+regprof.profiler.instrument(regrecord.Replay, "position", "record position")
@@ -0,0 +1,155 @@
+# Register tables of the target being debugged, read from its gdb architecture.
+#
+# The scripts pick their register dicts from the machine gdb runs on, which is the
+# wrong one for a remote or cross target, and every read passes a name which gdb
+# looks up again. gdb.Architecture.registers() lists the registers the target
+# really has, raw and pseudo, in gdb's numbering, and register_groups() the groups
+# they are in (general, float, vector, system...). A Table is built from them once
+# per architecture and keeps the gdb.RegisterDescriptor of each name read, which
+# frame.read_register takes in place of the name.
+#
+# Walking every group is the costly part, so the groups are saved as json under
+# directory, keyed by the architecture name and a digest of the register names in
+# gdb's order, which differ between target descriptions of one architecture. The
+# names are listed once per gdb.Architecture as gdb makes a new one for another
+# description, and the next session debugging the same target loads the groups from
+# there. Descriptors are gdb objects and are found again by name, once each and only
+# for the registers read.
+#
+# Names the table does not have (lr, the RISC-V x and ABI names are user aliases in
+# gdb) get no descriptor and are read by name as before. A gdb without registers()
+# gets no table, load() returns None and every register is read by name.
+#
+# architecture() is the name of the target's architecture the scripts pick their
+# register dicts by: the selected frame's, the inferior's before the program runs,
+# and the machine gdb runs on only when gdb can't say.
+#
+# name = regtable.architecture()
+# table = regtable.load(frame.architecture())
+# val = frame.read_register(table.descriptor("x0") or "x0")
+# table.groups["vector"]
+
+import gdb
+import hashlib
+import json
+import os
+from platform import machine
+
+directory = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "gdb-registers")
+
+class Table(object):
+
+    def __init__(self, arch, key, names, groups):
+        self.arch = arch            # gdb.Architecture
+        self.key = key              # architecture name and register names digest
+        self.names = {name: i for i, name in enumerate(names)}    # name -> gdb register number
+        self.groups = groups        # group name -> register names
+        self.descriptors = {}       # name -> gdb.RegisterDescriptor, None if gdb has none by that name
+        self.source = None          # "built" or the cache file it was loaded from
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def descriptor(self, name):
+        """the descriptor to read name with, None to read it by name"""
+        try:
+            return self.descriptors[name]
+        except KeyError:
+            pass
+
+        descriptor = self.arch.registers().find(name) if name in self.names else None
+        self.descriptors[name] = descriptor
+        return descriptor
+
+    def summary(self):
+        groups = ", ".join(f'{name} {len(names)}' for name, names in self.groups.items())
+        return f'{self.key[0]}: {len(self.names)} registers ({groups}), {self.source}'
+
+def architecture():
+    """the name of the target's architecture, aarch64, arm, riscv:rv64..."""
+    try:
+        return gdb.selected_frame().architecture().name()
+    except gdb.error:
+        pass
+    try:
+        return gdb.selected_inferior().architecture().name()
+    except (gdb.error, AttributeError):
+        return machine()    # before gdb 12
+
+def signature(arch):
+    """names in gdb's order and the key of the architecture's table"""
+    names = [reg.name for reg in arch.registers()]
+    return names, (arch.name(), hashlib.sha1("\n".join(names).encode()).hexdigest())
+
+def build(arch):
+    """group name -> names, walking the architecture"""
+    groups = {}
+    for group in arch.register_groups():
+        groups[group.name] = [reg.name for reg in arch.registers(group.name)]
+    return groups
+
+def filename(key):
+    digest = hashlib.sha1(f'{key[0]}\0{key[1]}'.encode()).hexdigest()[:16]
+    return os.path.join(directory, f'{key[0].replace(":", "-")}-{digest}.json')
+
+def read(path, key):
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get("arch") != key[0] or saved.get("registers") != key[1]:
+        return None    # a digest collision or a file from another version
+    return saved["groups"]
+
+warned = False    # saving failed and the user has been told once
+
+def write(path, key, groups):
+    global warned
+    try:
+        os.makedirs(directory, exist_ok=True)
+        temp = f'{path}.{os.getpid()}'
+        with open(temp, "w") as f:
+            json.dump({"arch": key[0], "registers": key[1], "groups": groups}, f)
+        os.replace(temp, path)    # a second gdb saving the same table never sees half a file
+    except OSError as err:
+        if not warned:
+            warned = True
+            gdb.write(f'register table: could not save {path}: {err}, the tables are built each session\n', gdb.STDERR)
+
+tables = {}    # (architecture name, register names digest) -> Table, for this session
+keys = {}      # gdb.Architecture -> its names and key, so they are listed once per gdbarch
+
+def load(arch):
+    """the Table of the target's architecture, None when gdb can't list its registers"""
+    if not hasattr(arch, "registers"):
+        return None
+
+    if arch not in keys:
+        keys[arch] = signature(arch)
+    names, key = keys[arch]
+    table = tables.get(key)
+    if table is not None:
+        if table.arch is not arch:
+            # the same target again through another gdbarch, its descriptors are found again
+            source = table.source
+            table = tables[key] = Table(arch, key, names, table.groups)
+            table.source = source
+        return table
+
+    path = filename(key)
+    groups = read(path, key)
+    if groups is not None:
+        table = Table(arch, key, names, groups)
+        table.source = path
+    else:
+        groups = build(arch)
+        table = Table(arch, key, names, groups)
+        table.source = "built"
+        write(path, key, groups)
+
+    tables[key] = table
+    return table
@@ -0,0 +1,141 @@
+# Browse the registers as they were at an earlier step.
+#
+# A view is a sequence of recorded steps: the stop history (reghist), the trace in
+# memory (regtrace) or a trace file (tracefile). While a view is shown the snapshot
+# hands the windows the raw bytes of the step being browsed instead of reading the
+# target, so the register, vector and arm64 windows draw that step the way they draw
+# a stop. A register is shown as changed if it differs from the step before, in
+# execution order, whichever way the view was moved.
+#
+# Nothing is run again to move: the history is a ring of raw bytes, a trace step is
+# found from the change index (the last change of each register at or before the
+# step) and a trace file seeks to the keyframe before the step, so any step of a
+# 100k step trace is a few lookups away.
+#
+# regtime.show(regtime.TraceView(regtrace.trace))
+# regtime.scroll(-1)      # a step back, from the window's hscroll
+# regtime.show(None)      # back to the target
+
+import regindex
+import regsnap
+import tracefile
+
+class View(object):
+
+    def __init__(self, name, length, types=None):
+        self.name = name
+        self.length = length
+        self.types = types or {}  # name -> gdb.Type when known from the recording
+        self.step = length - 1
+        self.current = {}
+        self.previous = {}
+
+    def __len__(self):
+        return self.length
+
+    def values(self, step):
+        """name -> raw bytes after step"""
+        raise NotImplementedError
+
+    def goto(self, step):
+        self.step = max(0, min(step, self.length - 1))
+        self.current = self.values(self.step)
+        self.previous = self.values(self.step - 1) if self.step > 0 else self.current
+
+    def raw(self, name, values=None):
+        """raw bytes of name at the step shown, an alias is cut from its physical register"""
+        values = self.current if values is None else values
+        try:
+            return values[name]
+        except KeyError:
+            pass
+
+        alias = regsnap.snapshot.alias(name) if regsnap.snapshot.alias else None
+        if alias is None or not alias[0] in values:
+            raise ValueError(f"{name} not recorded")
+        physical, offset, size = alias
+        return values[physical][offset:offset + size]
+
+    def changed(self, name):
+        """True if name differs from the step before"""
+        try:
+            return self.raw(name) != self.raw(name, self.previous)
+        except ValueError:
+            return False
+
+    def title(self):
+        return f'{self.name} step {self.step}/{self.length - 1}'
+
+    def close(self):
+        pass
+
+class HistoryView(View):
+
+    def __init__(self, history):
+        super().__init__("history", len(history), history.types)
+        self.history = history
+
+    def values(self, step):
+        back = self.length - 1 - step
+        values = {}
+        for name in self.history.columns:
+            raw = self.history.get(name, back)
+            if raw is not None:
+                values[name] = raw
+        return values
+
+class TraceView(View):
+
+    def __init__(self, trace):
+        super().__init__("trace", len(trace), trace.types)
+        self.trace = trace
+        self.index = regindex.index
+        if self.index.source != "trace" or len(self.index) != len(trace):
+            self.index.build_trace(trace)
+
+    def values(self, step):
+        trace = self.trace
+        values = {}
+        for name, raw in trace.start.items():
+            last = self.index.before(name, step + 1) if name != "pc" else None
+            values[name] = raw if last is None else dict(trace.deltas(last))[name]
+        if "pc" in values:
+            values["pc"] = trace.pcs[step].to_bytes(len(values["pc"]), 'little')
+        return values
+
+class FileView(View):
+
+    def __init__(self, path):
+        self.reader = tracefile.TraceReader(path)
+        super().__init__(path, len(self.reader))
+
+    def values(self, step):
+        pc, raws = self.reader.state(step)
+        values = dict(zip(self.reader.names, (bytes(raw) for raw in raws)))
+        values["pc"] = pc.to_bytes(8, 'little')
+        return values
+
+    def close(self):
+        self.reader.close()
+
+#--------------------------
+# the view being browsed
+
+def show(view, step=None):
+    """show view at step, the last step if None, or go back to the target if view is None"""
+    old = regsnap.snapshot.view
+    if old is not None and old is not view:
+        old.close()
+    if view is not None:
+        if not len(view):
+            raise ValueError(f"{view.name} has no steps recorded")
+        view.goto(view.step if step is None else step)
+    regsnap.snapshot.browse(view)
+
+def scroll(num):
+    """move the view num steps, False if no view is shown"""
+    view = regsnap.snapshot.view
+    if view is None:
+        return False
+    show(view, view.step + num)
+    return True
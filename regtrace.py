@@ -0,0 +1,238 @@
+# Trace the registers while single stepping from Python.
+#
+# register trace N runs stepi N times inside one command, so gdb shows no prompt and
+# no window redraws until the end. After each step only the registers which changed
+# are recorded: the trace keeps the values at the start, then for each step the pc in
+# an array and a run of (register number, raw bytes) deltas packed into one bytearray.
+# Any step's register values are rebuilt by replaying the deltas.
+#
+# trace = regtrace.Trace()
+# trace.run(1000, ["x0", "x1", "v0"])
+# for name, raw in trace.deltas(10): ...
+#
+# With blocks set the trace runs a basic block at a time: the code ahead of the pc
+# is disassembled up to the first branch, a temporary breakpoint is put on the
+# branch and the inferior continues to it, then the branch is single stepped. That
+# is two stops for the block instead of one per instruction. The pc of each
+# instruction in between is known from the disassembly so the pc sequence is the
+# same as stepping, but the registers are only read at the end of the block and
+# the instructions before that record no deltas. A stop inside the block, at a
+# user breakpoint, records the instructions up to it and ends the trace there.
+
+import gdb
+import struct
+from array import array
+from time import perf_counter
+
+import regsnap
+import tracefile
+
+NUMBER = struct.Struct('<H')
+
+#--------------------------
+# instructions which end a basic block
+
+AARCH64_BRANCH = {"b", "bl", "br", "blr", "ret", "braa", "brab", "braaz", "brabz", "blraa", "blrab", "blraaz",
+                  "blrabz", "retaa", "retab", "cbz", "cbnz", "tbz", "tbnz", "svc", "hvc", "smc", "eret", "eretaa",
+                  "eretab", "brk", "hlt"}
+ARM_BRANCH = {"b", "bl", "bx", "blx", "bxj", "cbz", "cbnz", "tbb", "tbh", "svc", "bkpt"}
+ARM_COND = {"eq", "ne", "cs", "hs", "cc", "lo", "mi", "pl", "vs", "vc", "hi", "ls", "ge", "lt", "gt", "le", "al"}
+RISCV_BRANCH = {"j", "jal", "jalr", "jr", "ret", "call", "tail", "ecall", "ebreak", "mret", "sret",
+                "beq", "bne", "blt", "bge", "bltu", "bgeu", "bgt", "ble", "bgtu", "bleu",
+                "beqz", "bnez", "blez", "bgez", "bltz", "bgtz", "c.j", "c.jal", "c.jr", "c.jalr",
+                "c.beqz", "c.bnez", "c.ebreak"}
+
+def is_branch(arch, asm):
+    """True if the disassembled instruction can change the flow of control"""
+    parts = asm.lower().split(None, 1)
+    mnemonic = parts[0] if parts else ""
+    operands = parts[1] if len(parts) > 1 else ""
+
+    if arch.startswith("aarch64"):
+        return mnemonic in AARCH64_BRANCH or mnemonic.startswith("b.")
+    elif arch.startswith("arm"):
+        base = mnemonic.split(".")[0]
+        if base[-2:] in ARM_COND and base[:-2] in ARM_BRANCH:
+            base = base[:-2]
+        # anything which loads or moves the pc
+        return base in ARM_BRANCH or "pc" in operands and (base.startswith("pop") or base.startswith("ldm")
+               or operands.startswith("pc"))
+    elif arch.startswith("riscv"):
+        return mnemonic in RISCV_BRANCH
+
+    return True
+
+class Trace(object):
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.names = []        # register number -> name
+        self.numbers = {}      # name -> register number
+        self.types = {}        # name -> gdb.Type for formatting
+        self.start = {}        # name -> raw bytes before the first step
+        self.last = {}         # name -> raw bytes after the last step
+        self.pcs = array('Q')  # pc after each step
+        self.offsets = array('I', [0])  # deltas of step i are data[offsets[i]:offsets[i + 1]]
+        self.data = bytearray()
+        self.seconds = 0.0
+        self.stops = 0
+
+    def __len__(self):
+        return len(self.pcs)
+
+    def memory(self):
+        return len(self.data) + self.pcs.itemsize * len(self.pcs) + self.offsets.itemsize * len(self.offsets)
+
+    def read(self):
+        """name -> raw bytes of the traced registers now"""
+        values = {}
+        for name in self.names:
+            try:
+                values[name] = regsnap.snapshot.read_raw(name)
+            except (gdb.error, ValueError):
+                pass
+        return values
+
+    def begin(self, names):
+        self.clear()
+        for name in ["pc"] + [name for name in names if name != "pc"]:
+            self.numbers[name] = len(self.names)
+            self.names.append(name)
+
+        regsnap.snapshot.live()
+        regsnap.snapshot.check()
+        self.start = self.read()
+        self.last = dict(self.start)
+        for name in self.start:
+            self.types[name] = regsnap.snapshot.read(name).type
+
+    def add(self, values):
+        """record a step from name -> raw bytes"""
+        data = self.data
+        last = self.last
+        for name, raw in values.items():
+            if name in last and last[name] != raw and name != "pc":
+                data += NUMBER.pack(self.numbers[name])
+                data += raw
+                last[name] = raw
+
+        self.pcs.append(int.from_bytes(values.get("pc", b"\0"), 'little'))
+        self.offsets.append(len(data))
+
+    def step(self):
+        """stepi once and record the deltas, False when the program has stopped running"""
+        try:
+            gdb.execute("stepi", to_string=True)
+            if gdb.selected_thread() is None:
+                return False
+            regsnap.snapshot.check()
+            self.add(self.read())
+        except gdb.error:
+            return False
+        return True
+
+    def run(self, count, names, blocks=False):
+        """step count instructions, the number stepped"""
+        self.begin(names)
+        start = perf_counter()
+        try:
+            while len(self) < count:
+                if not (self.block(count - len(self)) if blocks else self.step()):
+                    break
+                self.stops += 1
+        except KeyboardInterrupt:
+            pass
+        self.seconds = perf_counter() - start
+        return len(self)
+
+    def block(self, count):
+        """run up to count instructions to the end of the basic block, False when the program has stopped"""
+        limit = min(count, 64)
+        try:
+            frame = gdb.selected_frame()
+            arch = frame.architecture()
+            insns = arch.disassemble(frame.pc(), count=limit + 1)
+        except gdb.error:
+            return False
+
+        ahead = 0
+        while ahead < min(limit, len(insns) - 1) and not is_branch(arch.name(), insns[ahead]['asm']):
+            ahead += 1
+
+        # a branch first, or too little straight-line code to be worth a breakpoint
+        if ahead < 2:
+            return self.step()
+
+        end = insns[ahead]['addr']
+        bp = gdb.Breakpoint(f'*{end:#x}', internal=True, temporary=True)
+        try:
+            gdb.execute("continue", to_string=True)
+            if gdb.selected_thread() is None:
+                return False
+            regsnap.snapshot.check()
+            pc = gdb.selected_frame().pc()
+        except gdb.error:
+            return False
+        finally:
+            if bp.is_valid():
+                bp.delete()
+
+        # the instructions before the stop ran straight through
+        ran = [insn['addr'] for insn in insns[1:ahead + 1]]
+        if pc in ran:
+            for addr in ran[:ran.index(pc)]:
+                self.pcs.append(addr)
+                self.offsets.append(len(self.data))
+        self.add(self.read())
+        # stopped before the end, at a user breakpoint in the block or by a signal elsewhere
+        return pc == end
+
+    def deltas(self, step):
+        """(name, raw bytes) of the registers changed by step"""
+        out = []
+        data = self.data
+        i = self.offsets[step]
+        end = self.offsets[step + 1]
+        while i < end:
+            name = self.names[NUMBER.unpack_from(data, i)[0]]
+            size = len(self.start[name])
+            out.append((name, bytes(data[i + 2:i + 2 + size])))
+            i += 2 + size
+        return out
+
+    def state(self, step):
+        """name -> raw bytes after step"""
+        values = dict(self.start)
+        for i in range(step + 1):
+            values.update(self.deltas(i))
+        if "pc" in values:
+            values["pc"] = self.pcs[step].to_bytes(len(values["pc"]), 'little')
+        return values
+
+    def save(self, path, keyframe=256):
+        """write the trace to a trace file, see tracefile"""
+        # the pc has its own field in each record
+        names = [name for name in self.names if name in self.start and name != "pc"]
+        writer = tracefile.TraceWriter(path, names, [len(self.start[name]) for name in names], keyframe)
+        try:
+            values = dict(self.start)
+            for step in range(len(self)):
+                values.update(self.deltas(step))
+                writer.write(self.pcs[step], [values[name] for name in names])
+        finally:
+            writer.close()
+
+    def format(self, name, raw):
+        try:
+            return gdb.Value(raw, self.types[name]).format_string()
+        except (KeyError, gdb.error, TypeError):
+            return "0x" + raw[::-1].hex()
+
+    def summary(self):
+        rate = len(self) / self.seconds if self.seconds else 0
+        return f'{len(self)} instructions in {self.seconds:.2f}s ({rate:.0f}/s), {self.stops} stops, ' \
+               f'{len(self.names)} registers, {self.memory() / 1024:.1f} KiB'
+
+trace = Trace()
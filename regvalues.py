@@ -0,0 +1,104 @@
+# Count the values a register takes, in a fixed amount of memory.
+#
+# A histogram counts each value exactly in a dict until it has seen more distinct
+# values than exact. It then moves to a count-min sketch: depth rows of width
+# counters, each value adding one to a counter per row picked by its hash, the
+# smallest of which is its estimated count. The estimate is never too low and is
+# too high by at most e / width of the total with high probability. Alongside the
+# sketch it keeps the top values, the ones with the largest estimates, so the
+# report can still name the common values of a register which takes millions.
+#
+# histogram = regvalues.Histogram()
+# histogram.add(value)
+# for value, count in histogram.top(10): ...
+
+import math
+from array import array
+
+MIX = 0x9E3779B97F4A7C15
+MASK = (1 << 64) - 1
+
+class CountMin(object):
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array('Q', bytes(8 * width)) for i in range(depth)]
+
+    def add(self, value, count=1):
+        """add count to value, its estimated count afterwards"""
+        # two hashes from one: the rows are h1 + i * h2, spread so that 5 and 6 do not walk together
+        h = hash(value) * MIX & MASK
+        h1 = h & 0xffffffff
+        h2 = h >> 32 | 1
+        estimate = None
+        for i, row in enumerate(self.rows):
+            j = (h1 + i * h2) % self.width
+            row[j] += count
+            if estimate is None or row[j] < estimate:
+                estimate = row[j]
+        return estimate
+
+    def memory(self):
+        return self.width * self.depth * 8
+
+class Histogram(object):
+
+    def __init__(self, exact=256, top=16, width=2048, depth=4):
+        self.exact = exact      # distinct values counted exactly
+        self.size = top         # values kept once counted by the sketch
+        self.width = width
+        self.depth = depth
+        self.counts = {}        # value -> count, exact or estimated
+        self.sketch = None
+        self.floor = 0          # no more than the smallest count in counts once sketched
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    def add(self, value):
+        self.total += 1
+        counts = self.counts
+        if self.sketch is None:
+            counts[value] = counts.get(value, 0) + 1
+            if len(counts) > self.exact:
+                self.overflow()
+            return
+
+        estimate = self.sketch.add(value)
+        if value in counts or len(counts) < self.size:
+            counts[value] = estimate
+        elif estimate > self.floor:
+            smallest = min(counts, key=counts.get)
+            if estimate > counts[smallest]:
+                del counts[smallest]
+                counts[value] = estimate
+            self.floor = min(counts.values())
+
+    def overflow(self):
+        """too many values to count exactly, move them into the sketch"""
+        self.sketch = CountMin(self.width, self.depth)
+        for value, count in self.counts.items():
+            self.sketch.add(value, count)
+        self.counts = dict(sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:self.size])
+        self.floor = min(self.counts.values())
+
+    def top(self, count=None):
+        """(value, count) most common first"""
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def error(self):
+        """how far a sketched count can be over, with probability 1 - e^-depth"""
+        return math.e / self.width * self.total if self.sketch else 0
+
+    def summary(self):
+        if self.sketch is None:
+            return f'{self.total} hits, {len(self.counts)} values'
+        return f'{self.total} hits, over {self.exact} values, top {len(self.counts)} counted to within ' \
+               f'{self.error():.0f} by a {self.depth}x{self.width} count-min sketch'
+
+def format_value(value):
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return f'{value} ({value:#x})'
+    return str(value)
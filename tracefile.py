@@ -0,0 +1,180 @@
+# Register trace files.
+#
+# A trace is stored as a full keyframe of every register every K steps and, for
+# the steps in between, only the registers which changed. A changed register is
+# written as the XOR of its old and new bytes with the zero bytes at each end cut
+# off, so a lane or two changing in a vector register costs a few bytes, and the
+# file grows with how much changes rather than with steps times registers.
+#
+# header    magic "REGTRACE", version u16, registers u16, keyframe interval u32
+# registers per register: name length u8, name, size u16
+# records   keyframe: kind 1 u8, pc u64, every register's bytes
+#           delta:    kind 0 u8, pc u64, count u16, then per register
+#                     number u16, start u8, length u8, xor bytes
+# index     file offset u64 of each keyframe
+# footer    index offset u64, steps u64, magic "REGINDEX"
+#
+# Step n is found by seeking to keyframe n // K through the index and applying at
+# most K - 1 deltas. The reader maps the file, so a large trace is not read in.
+# The footer is written last so the file is written front to back, which lets
+# a writer compress it with gzip. A compressed file is read into memory instead.
+#
+# No gdb calls are made here so a writer can run on a background thread.
+#
+# writer = tracefile.TraceWriter("run.trace", ["pc", "x0", "v0"], [8, 8, 16])
+# writer.write(pc, [raw_pc, raw_x0, raw_v0])
+# writer.close()
+# reader = tracefile.TraceReader("run.trace")
+# pc, values = reader.state(1000)
+
+import gzip
+import mmap
+import struct
+
+MAGIC = b"REGTRACE"
+INDEX_MAGIC = b"REGINDEX"
+GZIP_MAGIC = b"\x1f\x8b"
+VERSION = 2
+
+HEADER = struct.Struct('<8sHHI')
+FOOTER = struct.Struct('<QQ8s')
+RECORD = struct.Struct('<BQ')
+COUNT = struct.Struct('<H')
+CHANGE = struct.Struct('<HBB')
+OFFSET = struct.Struct('<Q')
+
+KEYFRAME = 1
+DELTA = 0
+
+def xor(a, b):
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+class TraceWriter(object):
+
+    def __init__(self, path, names, sizes, keyframe=256, compress=0):
+        """compress is the gzip level, 0 for none"""
+        self.file = gzip.open(path, "wb", compress) if compress else open(path, "wb", 1 << 16)
+        self.names = list(names)
+        self.sizes = list(sizes)
+        self.keyframe = keyframe
+        self.steps = 0
+        self.index = []
+        self.last = None
+
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(self.names), keyframe))
+        for name, size in zip(self.names, self.sizes):
+            encoded = name.encode()
+            self.file.write(bytes([len(encoded)]) + encoded + COUNT.pack(size))
+
+    def write(self, pc, values):
+        """add a step, values are the raw bytes of every register in the order given to the writer"""
+        if self.steps % self.keyframe == 0:
+            self.index.append(self.file.tell())
+            self.file.write(RECORD.pack(KEYFRAME, pc) + b"".join(values))
+        else:
+            changes = []
+            for number, (old, new) in enumerate(zip(self.last, values)):
+                if old != new:
+                    diff = xor(old, new)
+                    start = len(diff) - len(diff.lstrip(b"\0"))
+                    end = len(diff.rstrip(b"\0"))
+                    changes.append(CHANGE.pack(number, start, end - start) + diff[start:end])
+            self.file.write(RECORD.pack(DELTA, pc) + COUNT.pack(len(changes)) + b"".join(changes))
+
+        self.last = list(values)
+        self.steps += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        offset = self.file.tell()
+        for position in self.index:
+            self.file.write(OFFSET.pack(position))
+        self.file.write(FOOTER.pack(offset, self.steps, INDEX_MAGIC))
+        self.file.close()
+
+class TraceReader(object):
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(2) == GZIP_MAGIC:
+                f.seek(0)
+                self.map = gzip.decompress(f.read())
+            else:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.map) < HEADER.size + FOOTER.size:
+            raise ValueError(f"{path} is not a register trace")
+        magic, version, count, self.keyframe = HEADER.unpack_from(self.map, 0)
+        self.index, self.steps, index_magic = FOOTER.unpack_from(self.map, len(self.map) - FOOTER.size)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a register trace")
+        elif index_magic != INDEX_MAGIC:
+            raise ValueError(f"{path} was not closed, the trace has no index")
+
+        self.names = []
+        self.sizes = []
+        offset = HEADER.size
+        for i in range(count):
+            length = self.map[offset]
+            self.names.append(self.map[offset + 1:offset + 1 + length].decode())
+            self.sizes.append(COUNT.unpack_from(self.map, offset + 1 + length)[0])
+            offset += 1 + length + COUNT.size
+
+    def __len__(self):
+        return self.steps
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+
+    def record(self, offset, values):
+        """apply the record at offset to values, (pc, offset of the next record)"""
+        kind, pc = RECORD.unpack_from(self.map, offset)
+        offset += RECORD.size
+        if kind == KEYFRAME:
+            for number, size in enumerate(self.sizes):
+                values[number] = self.map[offset:offset + size]
+                offset += size
+            return pc, offset
+
+        count = COUNT.unpack_from(self.map, offset)[0]
+        offset += COUNT.size
+        for i in range(count):
+            number, start, length = CHANGE.unpack_from(self.map, offset)
+            offset += CHANGE.size
+            old = values[number]
+            diff = bytes(start) + self.map[offset:offset + length] + bytes(len(old) - start - length)
+            values[number] = xor(old, diff)
+            offset += length
+        return pc, offset
+
+    def state(self, step):
+        """(pc, list of raw bytes of every register) after step"""
+        if not 0 <= step < self.steps:
+            raise IndexError(f"step {step} not in trace of {self.steps}")
+
+        key = step // self.keyframe
+        offset = OFFSET.unpack_from(self.map, self.index + key * OFFSET.size)[0]
+        values = [None] * len(self.names)
+        for i in range(key * self.keyframe, step + 1):
+            pc, offset = self.record(offset, values)
+        return pc, values
+
+    def steps_from(self, first, count):
+        """(step, pc, numbers of the registers changed by the step, values) for count steps from first"""
+        if not 0 <= first < self.steps:
+            return
+
+        key = max(first - 1, 0) // self.keyframe
+        offset = OFFSET.unpack_from(self.map, self.index + key * OFFSET.size)[0]
+        values = [None] * len(self.names)
+        for step in range(key * self.keyframe, min(first + count, self.steps)):
+            old = list(values)
+            pc, offset = self.record(offset, values)
+            if step >= first:
+                yield step, pc, [n for n in range(len(values)) if values[n] != old[n]], values
@@ -0,0 +1,167 @@
+# Log the registers at every stop to a trace file from a background thread.
+#
+# On a stop the gdb thread reads the registers through the snapshot and puts the
+# pc and their raw bytes on a bounded queue, nothing more. A worker thread takes
+# them off, delta encodes them into a tracefile, compresses and syncs the file,
+# so the prompt never waits for the disk. The worker makes no gdb calls.
+#
+# When the disk falls behind and the queue fills, full decides: "block" makes the
+# stop wait for room, so stepping slows to the speed of the disk, "drop" throws the
+# stop away and counts it. sync is "never", "close" or a number of seconds between
+# fsyncs.
+#
+# log = tracelog.TraceLog("run.trace", ["x0", "v0"], compress=6, sync=5, full="block")
+# log.flush()    # wait for everything queued to be written
+# log.close()
+#
+# The worker is a daemon thread, so gdb exiting would kill it with the file half
+# written and no index. tracelog.log is closed from gdb_exiting (atexit before gdb 12).
+
+import atexit
+import gdb
+import os
+import queue
+import threading
+from time import monotonic
+
+import regsnap
+import tracefile
+
+class TraceLog(object):
+
+    def __init__(self, path, names, compress=0, sync="close", full="block", size=4096, keyframe=256):
+        self.path = path
+        self.sync = sync
+        self.full = full
+        self.queue = queue.Queue(size)
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+
+        regsnap.snapshot.live()
+        regsnap.snapshot.check()
+        self.names = []
+        sizes = []
+        # the pc has its own field in each record
+        for name in [name for name in names if name != "pc"]:
+            try:
+                sizes.append(len(regsnap.snapshot.read_raw(name)))
+                self.names.append(name)
+            except (gdb.error, ValueError):
+                pass
+
+        # the worker only gets plain Python objects, it opens the file itself so an error goes to self.error
+        self.thread = threading.Thread(target=self.run, args=(path, list(self.names), sizes, compress, keyframe),
+                                       name="register log", daemon=True)
+        self.thread.start()
+        gdb.events.stop.connect(self.record)
+
+    #--------------------------
+    # gdb thread
+
+    def record(self, event=None):
+        if not self.thread.is_alive():
+            self.stop()
+            return
+
+        try:
+            pc = int.from_bytes(regsnap.snapshot.read_raw("pc"), 'little')
+            values = [regsnap.snapshot.read_raw(name) for name in self.names]
+        except (gdb.error, ValueError):
+            return
+
+        if self.full == "drop":
+            try:
+                self.queue.put_nowait((pc, values))
+            except queue.Full:
+                self.dropped += 1
+            return
+
+        if not self.put((pc, values)):
+            self.stop()
+
+    def put(self, item):
+        """queue item, waiting for the worker unless it has died and will never make room, False if it has"""
+        while True:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if not self.thread.is_alive():
+                    return False
+
+    def flush(self):
+        """wait until everything queued is on disk"""
+        done = threading.Event()
+        if self.thread.is_alive() and self.put(("flush", done)):
+            while not done.wait(0.1) and self.thread.is_alive():
+                pass
+
+    def stop(self):
+        try:
+            gdb.events.stop.disconnect(self.record)
+        except ValueError:
+            pass
+
+    def close(self):
+        self.stop()
+        if self.thread.is_alive() and self.put(None):
+            self.thread.join()
+
+    def status(self):
+        state = "running" if self.thread.is_alive() else "closed"
+        st = f'{self.path} {state}: {self.written} written, {self.queue.qsize()} queued, {self.dropped} dropped'
+        return st + (f', error: {self.error}' if self.error else "")
+
+    #--------------------------
+    # worker thread, no gdb calls from here
+
+    def run(self, path, names, sizes, compress, keyframe):
+        try:
+            writer = tracefile.TraceWriter(path, names, sizes, keyframe, compress)
+        except (IOError, OSError) as err:
+            self.error = err
+            return
+
+        synced = monotonic()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                elif item[0] == "flush":
+                    writer.flush()
+                    if self.sync != "never":
+                        os.fsync(writer.fileno())
+                        synced = monotonic()
+                    item[1].set()
+                    continue
+
+                writer.write(*item)
+                self.written += 1
+
+                if not self.sync in ("never", "close") and monotonic() - synced >= self.sync:
+                    writer.flush()
+                    os.fsync(writer.fileno())
+                    synced = monotonic()
+        except (IOError, OSError) as err:
+            self.error = err
+        finally:
+            try:
+                writer.close()
+                if self.sync != "never":
+                    with open(path, "rb+") as f:
+                        os.fsync(f.fileno())
+            except (IOError, OSError) as err:
+                self.error = self.error or err
+
+log = None
+
+def exiting(event=None):
+    if log is not None:
+        log.close()
+
+try:
+    gdb.events.gdb_exiting.connect(exiting)
+except AttributeError:
+    atexit.register(exiting)
@@ -0,0 +1,143 @@
+# Remember what a TUI window is showing so it is only repainted when a row changes.
+#
+# The gdb Python TUI api has no cursor positioning, so a single row can't be rewritten
+# in place. Instead the rows of the last frame are kept: when nothing has changed the
+# window is left alone, otherwise the new frame is handed to gdb in one write with
+# full_window set. gdb then erases and refreshes the curses window once, and curses
+# only sends the cells which differ from what is on the terminal. With an erase and a
+# write per row each write is refreshed on its own and the whole window goes out.
+#
+# screen = tuiscreen.Screen(tui)
+# screen.draw(rows)
+#
+# A row which is not up to date yet is drawn with stale(row): its old text in grey.
+#
+# Rows is the part the register and vector windows share: their lines are kept in a
+# list, None for a row not formatted yet, and formatted when they come into view.
+# With a budget set in regsnap the rows shown are formatted first, the ones with a
+# changed register before the rest, until the budget is used up, and the rows left
+# are drawn with their old text greyed and finished in a slice posted for later. A
+# window using it has a screen and gives lines(), build(i), changed(i) and blank(i).
+#
+# class VectorWindow(tuiscreen.Rows):
+#     def render(self):
+#         self.draw_rows(range(self.start, ...))
+
+import gdb
+import re
+
+import regsnap
+
+GREY = "\x1b[38;5;246m"
+ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+
+def stale(row):
+    """the row greyed out, shown in place of one still to be formatted"""
+    return GREY + ESCAPE.sub("", row)
+
+class Screen(object):
+
+    def __init__(self, tui):
+        self.tui = tui
+        self.rows = None
+        self.size = None
+
+    def reset(self):
+        self.rows = None
+
+    def draw(self, rows):
+        """write rows to the window if they differ from the last frame, True if written"""
+        size = (self.tui.width, self.tui.height)
+        if rows == self.rows and size == self.size:
+            return False
+
+        self.rows = rows
+        self.size = size
+        text = "".join(rows)
+
+        try:
+            self.tui.write(text, True)    # gdb 14
+        except TypeError:
+            self.tui.erase()
+            self.tui.write(text)
+
+        return True
+
+class Rows(object):
+
+    def __init__(self):
+        self.stale = []      # the lines drawn last, greyed for rows a budgeted draw has not redone
+        self.posted = False  # a slice to finish the rows is posted
+
+    def keep(self, drawn, count):
+        """before count new rows, drawn the lines of the last draw, [] when the rows are not the same ones"""
+        # a slice posted for the old rows is dropped by regsnap.later, the new rows post their own
+        self.posted = False
+        if drawn and len(drawn) == count:
+            # a row the last draw did not get to keeps the text from the draw before
+            self.stale = [line or old for line, old in zip(drawn, self.stale or drawn)]
+        else:
+            self.stale = []
+
+    def draw_rows(self, shown):
+        """format the rows shown which are not yet and draw them"""
+        if regsnap.snapshot.budget is not None:
+            self.draw_budget(shown)
+            return
+
+        lines = self.lines()
+        rows = []
+        for i in shown:
+            if lines[i] is None:
+                try:
+                    lines[i] = self.build(i)
+                except gdb.error:
+                    break
+            rows.append(lines[i])
+
+        self.screen.draw(rows)
+
+    def draw_budget(self, shown):
+        """format the rows shown, changed first, then the rest until the budget is used up,
+        the rows left are drawn greyed and finished in a later slice"""
+        snapshot = regsnap.snapshot
+        lines = self.lines()
+        try:
+            # a row at least each time, so a budget shorter than a row still gets through them
+            for rows in (shown, range(len(lines))):
+                for i in self.pending(rows):
+                    lines[i] = self.build(i)
+                    if snapshot.expired():
+                        break
+                else:
+                    continue
+                break
+            if None in lines and not self.posted:
+                self.posted = True
+                snapshot.later(self.finish)
+        except gdb.error:
+            pass
+
+        self.screen.draw([lines[i] or self.stale_row(i) for i in shown])
+
+    def pending(self, rows):
+        """the rows not formatted yet, the ones with a changed register first"""
+        lines = self.lines()
+        todo = [i for i in rows if lines[i] is None]
+        changed = set()
+        for i in todo:
+            if regsnap.snapshot.expired():
+                break
+            if self.changed(i):
+                changed.add(i)
+        return [i for i in todo if i in changed] + [i for i in todo if not i in changed]
+
+    def stale_row(self, i):
+        if i < len(self.stale) and self.stale[i]:
+            return stale(self.stale[i])
+        return stale(self.blank(i))
+
+    def finish(self):
+        self.posted = False
+        if self.tui.is_valid() and None in self.lines():
+            self.render()
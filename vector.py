@@ -1,5 +1,13 @@
 # to do... create Vector64 and Vector32 with common Vector so help is specific to arch, etc.....
-from platform import machine
+from os.path import abspath, dirname, join
+gdb.execute(f'source {join(dirname(abspath(__file__)), "regpath.py")}')
+
+import regsnap
+import regtable
+import regtime
+import regfmt
+import regprof
+import tuiscreen
 
 GREEN = "\x1b[38;5;47m"
 BLUE  = "\x1b[38;5;14m"
@@ -8,7 +16,9 @@ GREY  = "\x1b[38;5;246m"
 RESET = "\x1b[0m"
 NL = "\n\n"
 
-if machine() == "aarch64":
+aarch64 = regtable.architecture().startswith("aarch64")
+
+if aarch64:
     reg_spec = ['v', 'b', 'h', 's', 'd', 'q']
     width_spec = ['d', 's', 'b', 'q', 'h']
     type_spec = ['f', 's', 'u']
@@ -244,7 +254,7 @@ type:  u8, u16, u32, u64, f32, f64"""
 
             i += 1
 
-if machine() == "aarch64":
+if aarch64:
     vectorCmd = Vector64Cmd()
 else:
     vectorCmd = Vector32Cmd()
@@ -252,30 +262,45 @@ else:
 def VectorWinFactory(tui):
     win = VectorWindow(tui)
     vectorCmd.set_window(win)
-    gdb.events.before_prompt.connect(win.create_vector)
+    regsnap.snapshot.subscribe(win.create_vector)
     return win
 
-class VectorWindow(object):
+class VectorWindow(tuiscreen.Rows):
 
     save_vector = {}
 
     def __init__(self, tui):
+        super(VectorWindow, self).__init__()
         self.tui = tui
         self.vector = VectorWindow.save_vector
         self.tui.title = "Vector Registers"
         self.start = 0
         self.list = []
+        self.screen = tuiscreen.Screen(tui)
+        self.names = []
+        self.options = None
+        self.generation = None
+        regsnap.snapshot.track(self.vector)
 
     def add_vector(self, name, width, type, hex):
-        self.vector[name] = {'width': width, 'type': type, 'val': None, 'hex': hex}
+        if not regsnap.snapshot.has(name):
+            raise SyntaxError(f'vector: the target has no register {name}')
+        if not name in self.vector:
+            regsnap.snapshot.track([name])
+        self.vector[name] = {'width': width, 'type': type, 'raw': None, 'hex': hex, 'text': None, 'options': None}
+        self.generation = None
 
     def clear_vector(self):
+        regsnap.snapshot.untrack(self.vector)
         self.vector.clear()
+        self.generation = None
 
     def delete_vector(self, argv):
         for name in argv:
             try:
                 del self.vector[name]
+                regsnap.snapshot.untrack([name])
+                self.generation = None
             except:
                 print(f"vector /d: {name} not found.")
 
@@ -291,51 +316,118 @@ class VectorWindow(object):
             print(st)
 
     def create_vector(self):
+        view = regsnap.snapshot.view
+        title = f'Vector Registers {view.title()}' if view else "Vector Registers"
+        if self.tui.title != title:
+            self.tui.title = title
+
+        if self.generation == regsnap.snapshot.generation:
+            self.render()
+            return
+
+        drawn = self.list
         self.list = []
+        self.generation = regsnap.snapshot.generation
 
         try:
-            frame = gdb.selected_frame()
+            # a trace file or the history is drawn from what it recorded, with or without a program
+            if view is None:
+                regsnap.snapshot.selected_frame()
         except gdb.error:
             self.title = "No Frame"
             self.list.append("No frame currently selected" + NL)
+            self.keep([], 1)
             self.render()
             return
 
-        for name, attr in self.vector.items():
-            val = frame.read_register(name)
-            hint = BLUE if attr['val'] != val  else WHITE
-            self.vector[name]['val'] = val
+        # rows are formatted by render when they scroll into view
+        names = list(self.vector)
+        self.keep(drawn if names == self.names else [], len(names))
+        self.names = names
+        self.options = regfmt.print_options()
+        self.list = [None] * len(self.names)
+        self.render()
 
-            width = attr['width']
-            type = attr['type']
+    def create_row(self, name):
+        attr = self.vector[name]
+        raw = regsnap.snapshot.read_raw(name)
+        hint = BLUE if regsnap.snapshot.changed(name, attr['raw'], raw) else WHITE
 
-            if attr['hex']:
-                type = 'u' if type == 'f' else type
-                if width:
-                    st = val[width][type].format_string(format='z', repeat_threshold=0) if type else val[width].format_string(format='z')
-                else:
-                    st = val[type].format_string(format='z') if type else val.format_string(format='z')
+        # unchanged bytes with the same print settings give the same text
+        if attr['raw'] != raw or attr['text'] is None or attr['options'] != self.options:
+            attr['raw'] = raw
+            attr['options'] = self.options
+            try:
+                attr['text'] = self.format_row(name, attr, raw)
+            except gdb.error:
+                # no type with the lanes, a trace file browsed before the register was read
+                attr['text'] = None
+                return f'{GREEN}{name:<5}{hint}0x{raw[::-1].hex()}{RESET}{NL}'
+
+        return f'{GREEN}{name:<5}{hint}{attr["text"]}{RESET}{NL}'
+
+    def format_row(self, name, attr, raw):
+        val = regsnap.snapshot.read(name)
+        width = attr['width']
+        type = attr['type']
+        fmt = None
+
+        if attr['hex']:
+            type = 'u' if type == 'f' else type
+            fmt = 'z'
+
+        st = None
+        if self.options:
+            # lanes unpacked from the raw bytes in python, same text as format_string
+            path = tuple(spec for spec in (width, type) if spec)
+            repeats = 0 if width and type else self.options[0]
+            st = regfmt.format_raw(val.type, raw, path, fmt, repeats, self.options[1])
+
+        if st is None:
+            st = self.format_vector(val, width, type, attr['hex'])
+
+        return str(st)
+
+    def format_vector(self, val, width, type, hex):
+        if hex:
+            if width:
+                return val[width][type].format_string(format='z', repeat_threshold=0) if type else val[width].format_string(format='z')
             else:
-                if width:
-                    st = val[width][type].format_string(repeat_threshold=0) if type else val[width]
-                else:
-                    st = val[type] if type else val
-
-            self.list.append(f'{GREEN}{name:<5}{hint}{st}{RESET}{NL}')
-
-        self.render()
+                return val[type].format_string(format='z') if type else val.format_string(format='z')
+        else:
+            if width:
+                return val[width][type].format_string(repeat_threshold=0) if type else val[width]
+            else:
+                return val[type] if type else val
 
     def close(self):
-        gdb.events.before_prompt.disconnect(self.create_vector)
+        regsnap.snapshot.unsubscribe(self.create_vector)
+        regsnap.snapshot.untrack(self.vector)
         VectorWindow.save_vector = self.vector
 
     def render(self):
         if not self.tui.is_valid():
             return
 
-        self.tui.erase()
-        for l in self.list[self.start:]:
-            self.tui.write(l)
+        # only the rows which fit in the window are formatted, each is followed by a blank line
+        self.draw_rows(range(self.start, min(len(self.list), self.start + self.tui.height // 2 + 1)))
+
+    def lines(self):
+        return self.list
+
+    def build(self, i):
+        return self.create_row(self.names[i])
+
+    def changed(self, i):
+        name = self.names[i]
+        return regsnap.snapshot.changed(name, self.vector[name]['raw'], regsnap.snapshot.read_raw(name))
+
+    def blank(self, i):
+        return f'{self.names[i]:<5}{NL}'
+
+    def hscroll(self, num):
+        # move through the recorded steps being browsed
+        regtime.scroll(num)
 
     def vscroll(self, num):
         if num > 0 and num + self.start < len(self.list) or \
@@ -345,3 +437,7 @@ class VectorWindow(object):
 
 gdb.register_window_type("vector", VectorWinFactory)
 
+regprof.profiler.instrument(VectorWindow, "create_row", "line building", lambda args: args[1])
+regprof.profiler.instrument(VectorWindow, "format_row", "format_string", lambda args: args[1])
+regprof.profiler.instrument(tuiscreen.Screen, "draw", "tui.write")
+